@@ -4,16 +4,27 @@ AI数据分析模块
 """
 import re
 import json
+import time
 import asyncio
-from typing import Dict, List, Any, Optional, Tuple
+import hashlib
+from collections import OrderedDict
+from operator import attrgetter
+from bisect import bisect_left
+from typing import Dict, List, Any, Optional, Tuple, Union
 from dataclasses import dataclass, field
 from enum import Enum
 from loguru import logger
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from scipy import sparse
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+
+try:
+    import ahocorasick  # 可选依赖：多模式匹配自动机
+except ImportError:
+    ahocorasick = None
 
 
 class SentimentLabel(Enum):
@@ -23,7 +34,7 @@ class SentimentLabel(Enum):
     NEUTRAL = "neutral"    # 中性
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SentimentResult:
     """情感分析结果"""
     label: SentimentLabel
@@ -33,7 +44,7 @@ class SentimentResult:
     neutral_probability: float
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Entity:
     """实体"""
     text: str
@@ -43,30 +54,144 @@ class Entity:
     confidence: float
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class EntityExtractionResult:
     """实体提取结果"""
     entities: List[Entity]
     text: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True, eq=False)
 class CustomerSegment:
-    """客户细分"""
+    """客户细分（含ndarray字段，按对象身份比较和哈希）"""
     segment_id: int
     size: int  # 该细分中的客户数
-    characteristics: Dict[str, float]  # 特征中心点
+    center: np.ndarray  # 特征中心点 (float32，只读)
+    feature_names: List[str]  # 特征名称，各细分共享同一列表
     description: str
 
+    @property
+    def characteristics(self) -> Dict[str, float]:
+        """特征名 -> 中心点取值"""
+        return dict(zip(self.feature_names, self.center.tolist()))
+
+
+class AsyncRateLimiter:
+    """异步令牌桶限流器，用于遵守API的每分钟请求数(RPM)限制"""
+
+    def __init__(self, requests_per_minute: int):
+        self.capacity = max(1, requests_per_minute)
+        self.tokens = float(self.capacity)
+        self.fill_rate = self.capacity / 60.0
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """获取一个令牌，令牌不足时等待"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.fill_rate)
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.fill_rate)
+
+
+# AFINN风格的情感词典：词 -> 情感强度权重，取值范围[-5, +5]
+_SENTIMENT_LEXICON: Dict[str, int] = {
+    '好': 2, '优秀': 3, '满意': 2, '喜欢': 2, '高兴': 3, '开心': 3, '棒': 3, '赞': 3,
+    'good': 3, 'great': 3, 'excellent': 3, 'amazing': 4, 'wonderful': 4, 'happy': 3,
+    '推荐': 2, '感谢': 2, '谢谢': 2, '优质': 3, '高效': 2,
+    '差': -2, '不好': -2, '讨厌': -3, '失望': -2, '愤怒': -3, '糟糕': -3, '垃圾': -3, '烂': -3,
+    'bad': -3, 'terrible': -3, 'awful': -3, 'hate': -3, 'disappointed': -2, 'angry': -3,
+    '投诉': -2, '问题': -2, '错误': -2, '失败': -2, '慢': -2, '贵': -2, '不满意': -2,
+}
+
+# 由词典派生的查找结构，导入时构建一次；自动机的值为词在权重数组中的下标
+_LEXICON_WORDS: Tuple[str, ...] = tuple(_SENTIMENT_LEXICON)
+_LEXICON_WEIGHTS = np.array(list(_SENTIMENT_LEXICON.values()), dtype=np.float32)
+_LEXICON_INDEX: Dict[str, int] = {word: i for i, word in enumerate(_LEXICON_WORDS)}
+
+
+def _build_lexicon_automaton():
+    """构建情感词的Aho-Corasick自动机（未安装pyahocorasick时退化为正则）"""
+    if ahocorasick is None:
+        # 长词优先，保证“不满意”不会被拆成“满意”
+        words = sorted(_LEXICON_WORDS, key=len, reverse=True)
+        return re.compile('|'.join(map(re.escape, words)))
+
+    automaton = ahocorasick.Automaton()
+    for i, word in enumerate(_LEXICON_WORDS):
+        automaton.add_word(word, i)
+    automaton.make_automaton()
+    return automaton
+
+
+_LEXICON_AUTOMATON = _build_lexicon_automaton()
+
 
 class SentimentAnalyzer:
     """情感分析器"""
 
-    def __init__(self, openai_api_key: Optional[str] = None, anthropic_api_key: Optional[str] = None):
+    MAX_WEIGHT = 5.0
+
+    # 归一化得分的情感分界
+    NEGATIVE_THRESHOLD = 0.33
+    POSITIVE_THRESHOLD = 0.67
+
+    OPENAI_MODEL = "gpt-3.5-turbo"
+    BATCH_TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+    SYSTEM_PROMPT = "你是一个情感分析专家。分析给定文本的情感倾向，返回JSON格式：{\"sentiment\": \"positive/negative/neutral\", \"confidence\": 0.0-1.0, \"scores\": {\"positive\": 0.0-1.0, \"negative\": 0.0-1.0, \"neutral\": 0.0-1.0}}"
+
+    def __init__(
+        self,
+        openai_api_key: Optional[str] = None,
+        anthropic_api_key: Optional[str] = None,
+        max_concurrent: int = 10,
+        requests_per_minute: int = 500,
+        batch_api_threshold: Optional[int] = None,
+        batch_api_poll_interval: float = 30.0,
+        batch_api_timeout: float = 300.0,
+        batch_api_cancel_timeout: float = 600.0,
+    ):
         self.openai_api_key = openai_api_key
         self.anthropic_api_key = anthropic_api_key
         self._use_local_fallback = True  # 如果API不可用，使用本地规则
 
+        # 批量分析配置：达到batch_api_threshold条时使用OpenAI Batch API，None为不使用（需显式开启）
+        # 调用方会同步等待批量任务，超时后取消任务，已完成部分取回，其余改用实时接口
+        self.batch_api_threshold = batch_api_threshold
+        self.batch_api_poll_interval = batch_api_poll_interval
+        self.batch_api_timeout = batch_api_timeout
+        self.batch_api_cancel_timeout = batch_api_cancel_timeout  # 等待取消完成的上限（取消最长需约10分钟）
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._rate_limiter = AsyncRateLimiter(requests_per_minute)
+
+        # 复用同一个客户端，保持连接池与TLS会话
+        self._openai_client = self._create_openai_client()
+
+    def _create_openai_client(self):
+        """创建OpenAI异步客户端，未配置密钥或未安装库时返回None"""
+        if not self.openai_api_key:
+            return None
+
+        try:
+            from openai import AsyncOpenAI
+        except ImportError:
+            logger.warning("OpenAI库未安装，使用本地规则")
+            return None
+
+        return AsyncOpenAI(api_key=self.openai_api_key)
+
+    @property
+    def uses_api(self) -> bool:
+        """是否通过远程API分析（否则为本地规则）"""
+        return self._openai_client is not None
+
     async def analyze(self, text: str) -> SentimentResult:
         """
         分析文本情感
@@ -78,7 +203,7 @@ class SentimentAnalyzer:
             SentimentResult对象
         """
         # 尝试使用AI API
-        if self.openai_api_key:
+        if self._openai_client is not None:
             try:
                 return await self._analyze_with_openai(text)
             except Exception as e:
@@ -87,64 +212,178 @@ class SentimentAnalyzer:
         # 降级到本地规则
         return self._analyze_with_rules(text)
 
+    async def analyze_batch(self, texts: List[str]) -> List[SentimentResult]:
+        """
+        批量分析文本情感
+
+        默认使用asyncio.gather并发请求（受并发数与RPM限制），
+        设置了batch_api_threshold时，大批量提交到OpenAI Batch API以降低成本。
+
+        Args:
+            texts: 待分析的文本列表
+
+        Returns:
+            与texts顺序一致的SentimentResult列表
+        """
+        if not texts:
+            return []
+
+        if self._openai_client is None:
+            return [self._analyze_with_rules(text) for text in texts]
+
+        if self.batch_api_threshold is not None and len(texts) >= self.batch_api_threshold:
+            try:
+                return await self._analyze_with_openai_batch_api(texts)
+            except Exception as e:
+                logger.warning(f"OpenAI Batch API失败，改用并发请求: {e}")
+
+        return list(await asyncio.gather(
+            *(self._analyze_throttled(text) for text in texts)
+        ))
+
+    async def _analyze_throttled(self, text: str) -> SentimentResult:
+        """在并发数与速率限制下分析单条文本，失败时降级到本地规则"""
+        async with self._semaphore:
+            await self._rate_limiter.acquire()
+            try:
+                return await self._analyze_with_openai(text)
+            except Exception as e:
+                logger.warning(f"OpenAI分析失败，使用本地规则: {e}")
+
+        return self._analyze_with_rules(text)
+
+    def _build_request_body(self, text: str) -> Dict[str, Any]:
+        """构建chat.completions请求参数"""
+        return {
+            "model": self.OPENAI_MODEL,
+            "messages": [
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": text}
+            ],
+            "temperature": 0.3,
+        }
+
+    def _parse_openai_result(self, result_text: str) -> SentimentResult:
+        """解析OpenAI返回的JSON结果"""
+        result = json.loads(result_text)
+
+        return SentimentResult(
+            label=SentimentLabel(result.get('sentiment', 'neutral')),
+            score=result.get('confidence', 0.5),
+            positive_probability=result.get('scores', {}).get('positive', 0.33),
+            negative_probability=result.get('scores', {}).get('negative', 0.33),
+            neutral_probability=result.get('scores', {}).get('neutral', 0.33),
+        )
+
     async def _analyze_with_openai(self, text: str) -> SentimentResult:
         """使用OpenAI API分析"""
         try:
-            from openai import AsyncOpenAI
-            client = AsyncOpenAI(api_key=self.openai_api_key)
-
-            response = await client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个情感分析专家。分析给定文本的情感倾向，返回JSON格式：{\"sentiment\": \"positive/negative/neutral\", \"confidence\": 0.0-1.0, \"scores\": {\"positive\": 0.0-1.0, \"negative\": 0.0-1.0, \"neutral\": 0.0-1.0}}"
-                    },
-                    {"role": "user", "content": text}
-                ],
-                temperature=0.3,
-            )
+            response = await self._openai_client.chat.completions.create(**self._build_request_body(text))
 
-            result_text = response.choices[0].message.content
-            result = json.loads(result_text)
+            return self._parse_openai_result(response.choices[0].message.content)
 
-            return SentimentResult(
-                label=SentimentLabel(result.get('sentiment', 'neutral')),
-                score=result.get('confidence', 0.5),
-                positive_probability=result.get('scores', {}).get('positive', 0.33),
-                negative_probability=result.get('scores', {}).get('negative', 0.33),
-                neutral_probability=result.get('scores', {}).get('neutral', 0.33),
-            )
-
-        except ImportError:
-            logger.warning("OpenAI库未安装")
-            raise
         except Exception as e:
             logger.error(f"OpenAI API调用失败: {e}")
             raise
 
-    def _analyze_with_rules(self, text: str) -> SentimentResult:
-        """使用规则进行情感分析"""
-        # 简单的情感词典
-        positive_words = [
-            '好', '优秀', '满意', '喜欢', '高兴', '开心', '棒', '赞',
-            'good', 'great', 'excellent', 'amazing', 'wonderful', 'happy',
-            '满意', '推荐', '感谢', '谢谢', '优质', '高效'
+    async def _analyze_with_openai_batch_api(self, texts: List[str]) -> List[SentimentResult]:
+        """使用OpenAI Batch API批量分析（异步任务，费用为实时接口的50%）"""
+        client = self._openai_client
+        lines = [
+            json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._build_request_body(text),
+            }, ensure_ascii=False)
+            for i, text in enumerate(texts)
         ]
 
-        negative_words = [
-            '差', '不好', '讨厌', '失望', '愤怒', '糟糕', '垃圾', '烂',
-            'bad', 'terrible', 'awful', 'hate', 'disappointed', 'angry',
-            '投诉', '问题', '错误', '失败', '慢', '贵', '不满意'
-        ]
+        batch_file = await client.files.create(
+            file=("sentiment_batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info(f"已提交OpenAI批量任务 {batch.id}，共{len(texts)}条")
+
+        # 任务已提交，部分条目可能已处理并计费：之后超时或出错时先取消任务，
+        # 取回已完成的部分，只把缺失的条目发到实时接口
+        results: List[Optional[SentimentResult]] = [None] * len(texts)
+        try:
+            # 轮询任务状态
+            deadline = time.monotonic() + self.batch_api_timeout
+            while batch.status not in self.BATCH_TERMINAL_STATUSES:
+                if time.monotonic() >= deadline:
+                    logger.warning(f"批量任务 {batch.id} 超时，取消并使用已完成部分")
+                    batch = await self._cancel_batch(batch)
+                    break
+                await asyncio.sleep(self.batch_api_poll_interval)
+                batch = await client.batches.retrieve(batch.id)
+
+            if batch.output_file_id:
+                content = await client.files.content(batch.output_file_id)
+                self._parse_batch_output(content.text, results)
+        except Exception as e:
+            logger.warning(f"获取批量任务 {batch.id} 结果失败，取消任务: {e}")
+            batch = await self._cancel_batch(batch)
+
+        # 整体失败（如输入校验不通过）时没有条目被处理，交给调用方改用实时接口
+        if batch.status == 'failed':
+            raise RuntimeError(f"批量任务 {batch.id} 失败")
+
+        # 未完成或失败的条目改用实时接口
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            if batch.status not in self.BATCH_TERMINAL_STATUSES:
+                logger.warning(f"批量任务 {batch.id} 未能确认取消，部分条目可能重复计费")
+            logger.info(f"批量任务 {batch.id} 有{len(missing)}条未完成，改用实时接口")
+            realtime_results = await asyncio.gather(
+                *(self._analyze_throttled(texts[i]) for i in missing)
+            )
+            for i, result in zip(missing, realtime_results):
+                results[i] = result
 
-        # 统计情感词
-        positive_count = sum(1 for word in positive_words if word in text)
-        negative_count = sum(1 for word in negative_words if word in text)
+        return results
+
+    async def _cancel_batch(self, batch):
+        """取消批量任务并等待其进入终态，返回最新的任务对象（取消失败时返回原对象）"""
+        client = self._openai_client
+        try:
+            batch = await client.batches.cancel(batch.id)
+            deadline = time.monotonic() + self.batch_api_cancel_timeout
+            while batch.status not in self.BATCH_TERMINAL_STATUSES and time.monotonic() < deadline:
+                await asyncio.sleep(self.batch_api_poll_interval)
+                batch = await client.batches.retrieve(batch.id)
+        except Exception as e:
+            logger.warning(f"取消批量任务 {batch.id} 失败: {e}")
+        return batch
+
+    def _parse_batch_output(self, output: str, results: List[Optional[SentimentResult]]):
+        """解析批量任务输出文件，按custom_id写入results"""
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                response = item.get('response') or {}
+                if response.get('status_code') != 200:
+                    continue
+                message = response['body']['choices'][0]['message']['content']
+                results[int(item['custom_id'])] = self._parse_openai_result(message)
+            except (KeyError, IndexError, ValueError) as e:
+                logger.warning(f"解析批量结果失败: {e}")
 
-        total = positive_count + negative_count
+    def _analyze_with_rules(self, text: str) -> SentimentResult:
+        """使用规则进行情感分析"""
+        # 命中情感词的权重
+        weights = self._match_weights(text)
+        m = weights.size
 
-        if total == 0:
+        if m == 0:
             # 没有明显的情感词，判断为中性
             return SentimentResult(
                 label=SentimentLabel.NEUTRAL,
@@ -154,21 +393,25 @@ class SentimentAnalyzer:
                 neutral_probability=0.34,
             )
 
+        # 平均情感强度，归一化到[0, 1]
+        polarity = float(weights.sum()) / m / self.MAX_WEIGHT
+        normalized = (polarity + 1) / 2
+
         # 计算概率
-        positive_prob = (positive_count + 1) / (total + 3)  # 拉普拉斯平滑
-        negative_prob = (negative_count + 1) / (total + 3)
+        positive_prob = float((weights > 0).sum()) / m
+        negative_prob = float((weights < 0).sum()) / m
         neutral_prob = 1 - positive_prob - negative_prob
 
         # 确定主要情感
-        if positive_prob > negative_prob and positive_prob > neutral_prob:
+        if normalized >= self.POSITIVE_THRESHOLD:
             label = SentimentLabel.POSITIVE
-            score = positive_prob
-        elif negative_prob > positive_prob and negative_prob > neutral_prob:
+            score = normalized
+        elif normalized <= self.NEGATIVE_THRESHOLD:
             label = SentimentLabel.NEGATIVE
-            score = negative_prob
+            score = 1 - normalized
         else:
             label = SentimentLabel.NEUTRAL
-            score = max(positive_prob, negative_prob, neutral_prob)
+            score = 1 - abs(polarity)
 
         return SentimentResult(
             label=label,
@@ -178,6 +421,39 @@ class SentimentAnalyzer:
             neutral_probability=neutral_prob,
         )
 
+    def _match_weights(self, text: str) -> np.ndarray:
+        """扫描文本，返回命中情感词的权重数组（最长匹配、互不重叠）"""
+        if ahocorasick is None:
+            indices = [_LEXICON_INDEX[match.group()] for match in _LEXICON_AUTOMATON.finditer(text)]
+        else:
+            indices = [index for _, index in _LEXICON_AUTOMATON.iter_long(text)]
+
+        return _LEXICON_WEIGHTS[np.array(indices, dtype=np.intp)]
+
+
+def _combine_patterns(patterns: Dict[str, "re.Pattern"], labels: Tuple[str, ...]) -> "re.Pattern":
+    """将指定类型的正则合并为一个带命名分组的交替模式，一次扫描即可匹配这些类型"""
+    parts = []
+    for label in labels:
+        pattern = patterns[label]
+        expr = pattern.pattern
+        if pattern.flags & re.IGNORECASE:
+            expr = f'(?i:{expr})'
+        parts.append(f'(?P<{label}>{expr})')
+    return re.compile('|'.join(parts))
+
+
+def _build_suffix_automaton(suffixes) -> Optional[Any]:
+    """构建后缀的Aho-Corasick自动机，值为后缀长度（未安装pyahocorasick时返回None）"""
+    if ahocorasick is None:
+        return None
+
+    automaton = ahocorasick.Automaton()
+    for suffix in suffixes:
+        automaton.add_word(suffix, len(suffix))
+    automaton.make_automaton()
+    return automaton
+
 
 class EntityExtractor:
     """实体提取器"""
@@ -204,10 +480,35 @@ class EntityExtractor:
             r'\d{4}[-/年]\d{1,2}[-/月]\d{1,2}[日]?'
         ),
         'PRICE': re.compile(
-            r'¥?[$￥]?\s?\d+(?:,\d{3})*(?:\.\d{2})?元?'
+            r'(?:[¥$￥]\s?)?\d+(?:,\d{3})*(?:\.\d{2})?元?'
         ),
     }
 
+    # 按组合并扫描：组内按顺序决定同一位置的匹配优先级，组间允许重叠（如邮箱中的手机号）
+    # PRICE可匹配任意数字串，会吞掉其他数字实体，单独扫描
+    _COMBINED_PATTERNS = (
+        _combine_patterns(PATTERNS, ('EMAIL', 'WECHAT', 'URL')),
+        _combine_patterns(PATTERNS, ('PHONE', 'IP_ADDRESS', 'DATE')),
+    )
+
+    # 公司后缀
+    COMPANY_SUFFIXES = frozenset({'公司', '企业', '集团', '有限公司', '科技', '网络', '信息', '咨询', 'Co.', 'Ltd.', 'Inc.'})
+
+    # 公司名模式：非标点/空白字符 + 任一公司后缀，长后缀优先（未安装pyahocorasick时使用）
+    _COMPANY_PATTERN = re.compile(
+        r'[^，。；！？\s]+(?:' + '|'.join(map(re.escape, sorted(COMPANY_SUFFIXES, key=len, reverse=True))) + ')'
+    )
+
+    # 公司后缀自动机与公司名的分隔符
+    _SUFFIX_AUTOMATON = _build_suffix_automaton(COMPANY_SUFFIXES)
+    _BOUNDARY_PATTERN = re.compile(r'[，。；！？\s]')
+
+    # 简单的中文人名模式：2-3个汉字
+    _NAME_PATTERN = re.compile(r'[\u4e00-\u9fa5]{2,3}(?:先生|女士|小姐|老师|经理|总监|CEO)?')
+
+    # 明显不是人名的词
+    _EXCLUDED_NAMES = frozenset({'这个', '那个', '什么', '怎么', '为什么', '因为', '所以', '但是', '如果', '虽然'})
+
     def __init__(self):
         self._use_ai = False  # 是否使用AI增强
 
@@ -221,20 +522,37 @@ class EntityExtractor:
         Returns:
             EntityExtractionResult对象
         """
+        return self.extract_sync(text)
+
+    def extract_sync(self, text: str) -> EntityExtractionResult:
+        """同步提取实体（纯CPU计算，可放入线程池执行）"""
         entities = []
 
-        # 使用正则表达式提取
-        for label, pattern in self.PATTERNS.items():
+        # 使用合并后的正则表达式分组扫描提取
+        for pattern in self._COMBINED_PATTERNS:
             for match in pattern.finditer(text):
                 entity = Entity(
                     text=match.group(),
-                    label=label,
+                    label=match.lastgroup,
                     start=match.start(),
                     end=match.end(),
                     confidence=0.9,  # 正则表达式匹配的置信度较高
                 )
                 entities.append(entity)
 
+        # 价格：跳过落在其他实体内的数字（手机号、日期、IP等）
+        spans = [(entity.start, entity.end) for entity in entities]
+        for match in self.PATTERNS['PRICE'].finditer(text):
+            start, end = match.span()
+            if not any(s <= start and end <= e for s, e in spans):
+                entities.append(Entity(
+                    text=match.group(),
+                    label='PRICE',
+                    start=start,
+                    end=end,
+                    confidence=0.9,
+                ))
+
         # 提取人名（简单的中文人名模式）
         person_entities = self._extract_chinese_names(text)
         entities.extend(person_entities)
@@ -243,8 +561,8 @@ class EntityExtractor:
         company_entities = self._extract_company_names(text)
         entities.extend(company_entities)
 
-        # 按起始位置排序
-        entities.sort(key=lambda e: e.start)
+        # 按起始位置排序（各段结果各自有序，timsort按已有序段合并）
+        entities.sort(key=attrgetter('start'))
 
         return EntityExtractionResult(
             entities=entities,
@@ -253,15 +571,11 @@ class EntityExtractor:
 
     def _extract_chinese_names(self, text: str) -> List[Entity]:
         """提取中文人名"""
-        # 简单的中文人名模式：2-3个汉字
-        name_pattern = re.compile(r'[\u4e00-\u9fa5]{2,3}(?:先生|女士|小姐|老师|经理|总监|CEO)?')
         entities = []
 
-        for match in name_pattern.finditer(text):
-            # 排除一些明显不是人名的词
-            excluded_words = {'这个', '那个', '什么', '怎么', '为什么', '因为', '所以', '但是', '如果', '虽然'}
+        for match in self._NAME_PATTERN.finditer(text):
             word = match.group()
-            if word not in excluded_words:
+            if word not in self._EXCLUDED_NAMES:
                 entity = Entity(
                     text=word,
                     label='PERSON',
@@ -275,32 +589,116 @@ class EntityExtractor:
 
     def _extract_company_names(self, text: str) -> List[Entity]:
         """提取公司名"""
-        # 公司后缀
-        company_suffixes = ['公司', '企业', '集团', '有限公司', '科技', '网络', '信息', '咨询', 'Co.', 'Ltd.', 'Inc.']
+        if self._SUFFIX_AUTOMATON is not None:
+            return self._extract_company_names_by_suffix(text)
 
         entities = []
-        for suffix in company_suffixes:
-            # 查找包含公司后缀的文本
-            pattern = re.compile(f'[^，。；！？\\s]+{suffix}')
-            for match in pattern.finditer(text):
-                entity = Entity(
-                    text=match.group(),
-                    label='COMPANY',
-                    start=match.start(),
-                    end=match.end(),
-                    confidence=0.7,
-                )
-                entities.append(entity)
+        for match in self._COMPANY_PATTERN.finditer(text):
+            entity = Entity(
+                text=match.group(),
+                label='COMPANY',
+                start=match.start(),
+                end=match.end(),
+                confidence=0.7,
+            )
+            entities.append(entity)
 
         return entities
 
+    def _extract_company_names_by_suffix(self, text: str) -> List[Entity]:
+        """
+        用后缀自动机提取公司名
+
+        一次扫描找出所有后缀，再回溯到前一个分隔符作为公司名起点；
+        同一片段内取最靠后的后缀，结果与_COMPANY_PATTERN一致。
+        """
+        boundaries = [match.start() for match in self._BOUNDARY_PATTERN.finditer(text)]
+
+        # 片段起点 -> 最靠后的后缀结束位置
+        spans: Dict[int, int] = {}
+        for end_index, suffix_length in self._SUFFIX_AUTOMATON.iter(text):
+            suffix_start = end_index - suffix_length + 1
+            i = bisect_left(boundaries, suffix_start) - 1
+            start = boundaries[i] + 1 if i >= 0 else 0
+            if start < suffix_start:  # 后缀前至少有一个字符
+                spans[start] = max(spans.get(start, 0), end_index + 1)
+
+        return [
+            Entity(
+                text=text[start:end],
+                label='COMPANY',
+                start=start,
+                end=end,
+                confidence=0.7,
+            )
+            for start, end in spans.items()
+        ]
+
 
 class CustomerSegmentation:
     """客户细分"""
 
-    def __init__(self):
-        self.scaler = StandardScaler()
-        self.vectorizer = TfidfVectorizer(max_features=100)
+    # 样本数达到该阈值时改用MiniBatchKMeans
+    MINIBATCH_THRESHOLD = 5000
+
+    # 缓存的已拟合转换器数量
+    FIT_CACHE_SIZE = 8
+
+    def __init__(self, use_hashing: bool = False):
+        """
+        Args:
+            use_hashing: 使用无状态的HashingVectorizer代替TF-IDF（无需拟合词表，适合词表漂移可接受的场景）
+        """
+        self.use_hashing = use_hashing
+        self.scaler, self.text_scaler, self.vectorizer = self._create_transformers()
+
+        # 按数据集指纹缓存已拟合的转换器，相同数据重复细分时跳过拟合
+        self._fit_cache: OrderedDict[str, Tuple[StandardScaler, StandardScaler, Any]] = OrderedDict()
+
+    def _create_transformers(self) -> Tuple[StandardScaler, StandardScaler, Any]:
+        """创建未拟合的转换器"""
+        if self.use_hashing:
+            vectorizer = HashingVectorizer(n_features=256, alternate_sign=False, dtype=np.float32)
+        else:
+            vectorizer = TfidfVectorizer(max_features=100, dtype=np.float32)
+
+        text_scaler = StandardScaler(with_mean=False)  # 稀疏矩阵不能中心化
+        return StandardScaler(), text_scaler, vectorizer
+
+    def _load_transformers(self, dataset_key: str) -> bool:
+        """
+        加载数据集对应的转换器
+
+        Returns:
+            是否命中缓存（命中时转换器已拟合，只需transform）
+        """
+        cached = self._fit_cache.get(dataset_key)
+        if cached is not None:
+            self._fit_cache.move_to_end(dataset_key)
+            self.scaler, self.text_scaler, self.vectorizer = cached
+            return True
+
+        self.scaler, self.text_scaler, self.vectorizer = self._create_transformers()
+        return False
+
+    def _store_transformers(self, dataset_key: str):
+        """缓存拟合成功的转换器"""
+        self._fit_cache[dataset_key] = (self.scaler, self.text_scaler, self.vectorizer)
+        if len(self._fit_cache) > self.FIT_CACHE_SIZE:
+            self._fit_cache.popitem(last=False)
+
+    @staticmethod
+    def _dataset_key(numeric_df: Optional[pd.DataFrame], text_data: Optional[pd.Series]) -> str:
+        """计算特征数据的内容指纹"""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (numeric_df, text_data):
+            if part is None:
+                digest.update(b'\x00')
+                continue
+            columns = part.columns if isinstance(part, pd.DataFrame) else [part.name]
+            digest.update('\x1f'.join(map(str, columns)).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(part, index=False).values.tobytes())
+        return digest.hexdigest()
 
     async def segment_customers(
         self,
@@ -325,40 +723,38 @@ class CustomerSegmentation:
         # 转换为DataFrame
         df = pd.DataFrame(customers)
 
-        # 准备特征
-        feature_matrix = self._prepare_features(df, features)
+        # 准备特征（已标准化）
+        feature_matrix_scaled = self._prepare_features(df, features)
 
-        if feature_matrix is None or feature_matrix.shape[1] == 0:
+        if feature_matrix_scaled is None or feature_matrix_scaled.shape[1] == 0:
             logger.warning("没有可用的特征进行聚类")
             return []
 
-        # 标准化
-        feature_matrix_scaled = self.scaler.fit_transform(feature_matrix)
-
-        # K-means聚类
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+        # K-means聚类（支持稀疏输入）
+        kmeans = self._create_kmeans(n_clusters, feature_matrix_scaled.shape[0])
         cluster_labels = kmeans.fit_predict(feature_matrix_scaled)
 
         # 分析每个细分
         segments = []
+        feature_names = self._get_feature_names(df, features)
+        cluster_sizes = np.bincount(cluster_labels, minlength=n_clusters)
+        cluster_centers = np.asarray(kmeans.cluster_centers_, dtype=np.float32)
+        cluster_centers.setflags(write=False)
 
         for cluster_id in range(n_clusters):
-            cluster_mask = cluster_labels == cluster_id
-            cluster_size = cluster_mask.sum()
+            cluster_size = int(cluster_sizes[cluster_id])
 
             # 获取该细分的特征中心
-            cluster_center = kmeans.cluster_centers_[cluster_id]
-            feature_names = self._get_feature_names(df, features)
-
-            characteristics = dict(zip(feature_names, cluster_center))
+            cluster_center = cluster_centers[cluster_id]
 
             # 生成描述
-            description = self._generate_description(cluster_id, cluster_size, characteristics)
+            description = self._generate_description(cluster_id, cluster_size, cluster_center, feature_names)
 
             segment = CustomerSegment(
                 segment_id=cluster_id,
-                size=int(cluster_size),
-                characteristics=characteristics,
+                size=cluster_size,
+                center=cluster_center,
+                feature_names=feature_names,
                 description=description
             )
             segments.append(segment)
@@ -366,12 +762,18 @@ class CustomerSegmentation:
         logger.info(f"客户细分完成，共{len(segments)}个细分")
         return segments
 
+    def _create_kmeans(self, n_clusters: int, n_samples: int):
+        """根据样本量选择聚类器，大样本使用MiniBatchKMeans"""
+        if n_samples >= self.MINIBATCH_THRESHOLD:
+            return MiniBatchKMeans(n_clusters=n_clusters, batch_size=1024, n_init=3, random_state=42)
+        return KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+
     def _prepare_features(
         self,
         df: pd.DataFrame,
         custom_features: List[str] = None
-    ) -> Optional[np.ndarray]:
-        """准备特征矩阵"""
+    ) -> Optional[Union[np.ndarray, sparse.csr_matrix]]:
+        """准备标准化后的特征矩阵，包含文本特征时返回稀疏CSR矩阵"""
         features_list = []
 
         # 数值特征
@@ -398,26 +800,48 @@ class CustomerSegmentation:
         if custom_features:
             numeric_features.extend([f for f in custom_features if f in df.columns and df[f].dtype in ['int64', 'float64']])
 
-        # 提取数值特征
-        if numeric_features:
-            numeric_df = df[numeric_features].fillna(0)
-            features_list.append(numeric_df.values)
+        numeric_df = df[numeric_features].fillna(0) if numeric_features else None
 
         # 文本特征（如果有description或notes）
+        text_data = None
         if 'description' in df.columns or 'notes' in df.columns:
             text_col = 'description' if 'description' in df.columns else 'notes'
             text_data = df[text_col].fillna('').astype(str)
 
+        # 相同数据复用已拟合的转换器
+        dataset_key = self._dataset_key(numeric_df, text_data)
+        fitted = self._load_transformers(dataset_key)
+        fit_ok = True
+
+        # 提取数值特征并标准化（float32，减半聚类时的内存带宽）
+        if numeric_df is not None:
+            numeric_values = numeric_df.values.astype(np.float32, copy=False)
+            if fitted:
+                features_list.append(self.scaler.transform(numeric_values))
+            else:
+                features_list.append(self.scaler.fit_transform(numeric_values))
+
+        if text_data is not None:
             try:
-                text_features = self.vectorizer.fit_transform(text_data).toarray()
+                # 保持稀疏，仅按标准差缩放
+                if fitted:
+                    text_features = self.text_scaler.transform(self.vectorizer.transform(text_data))
+                else:
+                    text_features = self.text_scaler.fit_transform(self.vectorizer.fit_transform(text_data))
                 features_list.append(text_features)
             except Exception as e:
                 logger.warning(f"文本特征提取失败: {e}")
+                fit_ok = False
+
+        # 全部拟合成功才缓存，避免之后命中未拟合的转换器
+        if not fitted and fit_ok:
+            self._store_transformers(dataset_key)
 
         # 合并所有特征
         if features_list:
-            feature_matrix = np.concatenate(features_list, axis=1)
-            return feature_matrix
+            if any(sparse.issparse(features) for features in features_list):
+                return sparse.hstack(features_list, format='csr')
+            return np.concatenate(features_list, axis=1)
 
         return None
 
@@ -433,12 +857,15 @@ class CustomerSegmentation:
                 names.append(feature)
 
         if custom_features:
-            names.extend([f for f in custom_features if f in df.columns])
+            names.extend([f for f in custom_features if f in df.columns and df[f].dtype in ['int64', 'float64']])
 
         # 文本特征名称
-        if hasattr(self.vectorizer, 'get_feature_names_out'):
-            text_feature_names = [f'text_{name}' for name in self.vectorizer.get_feature_names_out()]
-            names.extend(text_feature_names)
+        if 'description' in df.columns or 'notes' in df.columns:
+            if self.use_hashing:
+                names.extend(f'text_hash_{i}' for i in range(self.vectorizer.n_features))
+            elif hasattr(self.vectorizer, 'vocabulary_'):
+                text_feature_names = [f'text_{name}' for name in self.vectorizer.get_feature_names_out()]
+                names.extend(text_feature_names)
 
         return names
 
@@ -446,13 +873,13 @@ class CustomerSegmentation:
         self,
         cluster_id: int,
         size: int,
-        characteristics: Dict[str, float]
+        center: np.ndarray,
+        feature_names: List[str]
     ) -> str:
         """生成细分描述"""
         # 找出最显著的特征
-        sorted_features = sorted(characteristics.items(), key=lambda x: abs(x[1]), reverse=True)
-
-        top_features = sorted_features[:5]
+        top_indices = np.argsort(-np.abs(center), kind='stable')[:5]
+        top_features = [(feature_names[i], float(center[i])) for i in top_indices]
 
         desc_parts = [f"细分 #{cluster_id + 1}"]
 
@@ -479,7 +906,7 @@ class AIAnalytics:
         anthropic_api_key: Optional[str] = None
     ):
         self.sentiment_analyzer = SentimentAnalyzer(openai_api_key, anthropic_api_key)
-        self.entity_extractor = EntityExtractor()
+        self.entity_extractor = get_entity_extractor()
         self.customer_segmentation = CustomerSegmentation()
 
         # 统计信息
@@ -491,6 +918,12 @@ class AIAnalytics:
         self.total_analyzed += 1
         return result
 
+    async def analyze_sentiment_batch(self, texts: List[str]) -> List[SentimentResult]:
+        """批量分析文本情感"""
+        results = await self.sentiment_analyzer.analyze_batch(texts)
+        self.total_analyzed += len(texts)
+        return results
+
     async def extract_entities(self, text: str) -> EntityExtractionResult:
         """提取实体"""
         result = await self.entity_extractor.extract(text)
@@ -520,8 +953,17 @@ class AIAnalytics:
         Returns:
             包含情感和实体的分析结果
         """
-        sentiment = await self.analyze_sentiment(text)
-        entities = await self.extract_entities(text)
+        if self.sentiment_analyzer.uses_api:
+            # 情感分析等待API响应期间，在线程中并行完成实体提取
+            sentiment, entities = await asyncio.gather(
+                self.analyze_sentiment(text),
+                asyncio.to_thread(self.entity_extractor.extract_sync, text),
+            )
+            self.total_analyzed += 1
+        else:
+            # 均为本地计算，直接顺序执行以避免线程调度开销
+            sentiment = await self.analyze_sentiment(text)
+            entities = await self.extract_entities(text)
 
         return {
             'sentiment': {
@@ -553,6 +995,15 @@ class AIAnalytics:
 
 # 全局实例
 _analytics: Optional[AIAnalytics] = None
+_entity_extractor: Optional[EntityExtractor] = None
+
+
+def get_entity_extractor() -> EntityExtractor:
+    """获取全局实体提取器实例（无状态，可安全共享）"""
+    global _entity_extractor
+    if _entity_extractor is None:
+        _entity_extractor = EntityExtractor()
+    return _entity_extractor
 
 
 def get_analytics(
@@ -10,10 +10,10 @@ from loguru import logger
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class CompanyProfile:
     """企业画像数据类"""
     company_id: int
@@ -78,8 +78,11 @@ class CompanyProfileBuilder:
         # 1. 确定企业规模
         scale = self._determine_scale(company_data)
 
+        # 成立年限，供经营得分与风险评估共用
+        years = self._years_since(company_data.get('establishment_date'))
+
         # 2. 计算经营得分
-        operation_score = self._calculate_operation_score(company_data)
+        operation_score = self._calculate_operation_score(company_data, years)
 
         # 3. 计算财务得分
         financial_score = self._calculate_financial_score(company_data)
@@ -88,10 +91,10 @@ class CompanyProfileBuilder:
         credit_score = self._calculate_credit_score(company_data)
 
         # 5. 评估风险等级
-        risk_level, risk_tags = self._assess_risk(company_data)
+        risk_level, risk_tags = self._assess_risk(company_data, years)
 
-        # 6. 生成标签
-        tags = self._generate_tags(company_data)
+        # 6. 生成标签（复用已计算的规模）
+        tags = self._generate_tags(company_data, scale=scale)
 
         # 7. 判断是否推荐
         recommended, priority = self._evaluate_recommendation(
@@ -114,6 +117,137 @@ class CompanyProfileBuilder:
             priority=priority,
         )
 
+    def build_profiles(self, companies_data: List[Dict[str, Any]]) -> List[CompanyProfile]:
+        """
+        批量构建企业画像
+
+        评分与风险评估在DataFrame上按列向量化计算，规则与build_profile一致，
+        仅在最后逐行生成CompanyProfile对象。
+
+        Args:
+            companies_data: 企业数据字典列表
+
+        Returns:
+            CompanyProfile列表
+        """
+        if not companies_data:
+            return []
+
+        df = pd.DataFrame.from_records(companies_data)
+
+        employee_count = self._numeric_column(df, 'employee_count')
+        revenue = self._numeric_column(df, 'annual_revenue')
+        capital = self._numeric_column(df, 'registered_capital')
+        paid_in = self._numeric_column(df, 'paid_in_capital')
+        status = self._text_column(df, 'business_status')
+
+        # 1. 企业规模
+        scale = np.select(
+            [
+                (employee_count >= 1000) | (revenue >= 400000000),
+                (employee_count >= 100) | (revenue >= 20000000),
+                (employee_count >= 10) | (revenue >= 5000000),
+            ],
+            ['大型', '中型', '小型'],
+            default='微型',
+        )
+
+        # 成立年限（缺失或无法解析时为NaN）
+        if 'establishment_date' in df.columns:
+            establishment_date = pd.to_datetime(df['establishment_date'], errors='coerce', format='ISO8601')
+            years = ((pd.Timestamp.now() - establishment_date).dt.days / 365).to_numpy(dtype=float)
+        else:
+            years = np.full(len(df), np.nan)
+        has_years = ~np.isnan(years)
+
+        # 2. 经营得分
+        operation_score = 50.0 + np.where(has_years, np.minimum(years * 2, 20), 0)
+        operation_score += np.select(
+            [status.isin(['在业', '正常', '存续']), status.isin(['迁入', '迁出']), status.isin(['停业', '清算'])],
+            [30, 20, 10],
+            default=0,
+        )
+        operation_score = np.minimum(operation_score, 100.0)
+
+        # 3. 财务得分
+        paid_in_ratio = np.divide(paid_in, capital, out=np.zeros_like(capital), where=capital > 0)
+        financial_score = 50.0 + np.select(
+            [capital >= 100000000, capital >= 10000000, capital >= 1000000, capital >= 100000],
+            [20, 15, 10, 5],
+            default=0,
+        )
+        financial_score = np.minimum(financial_score + paid_in_ratio * 30, 100.0)
+
+        # 4. 信用得分
+        tax_points = self._text_column(df, 'tax_rating').map({'A': 20, 'B': 15, 'C': 10, 'D': 5})
+        credit_score = np.minimum(60.0 + tax_points.fillna(0).to_numpy(dtype=float), 100.0)
+
+        # 5. 风险评估
+        abnormal = status.isin(['吊销', '注销', '清算']).to_numpy()
+        newly_established = has_years & (years < 1)
+        insufficient_paid_in = (capital > 0) & (paid_in_ratio < 0.5)
+        risk_score = abnormal * 30 + newly_established * 20 + insufficient_paid_in * 15
+        risk_level = np.select([risk_score >= 50, risk_score >= 30], ['高', '中'], default='低')
+
+        # 7. 推荐评估
+        total_score = (operation_score + financial_score + credit_score) / 3
+        total_score = total_score * np.select([risk_level == '高', risk_level == '中'], [0.7, 0.85], default=1.0)
+        priority = np.select(
+            [total_score >= 80, total_score >= 70, total_score >= 60, total_score >= 50],
+            [5, 4, 3, 2],
+            default=1,
+        )
+        recommended = total_score >= 60
+
+        # 生成画像对象
+        profiles = []
+        rows = zip(
+            companies_data, scale.tolist(), operation_score.tolist(), financial_score.tolist(),
+            credit_score.tolist(), risk_level.tolist(), abnormal.tolist(), newly_established.tolist(),
+            insufficient_paid_in.tolist(), recommended.tolist(), priority.tolist(),
+        )
+        for (company_data, row_scale, row_operation, row_financial, row_credit, row_risk_level,
+             row_abnormal, row_new, row_insufficient, row_recommended, row_priority) in rows:
+            risk_tags = []
+            if row_abnormal:
+                risk_tags.append('经营异常')
+            if row_new:
+                risk_tags.append('新成立企业')
+            if row_insufficient:
+                risk_tags.append('实缴不足')
+
+            profiles.append(CompanyProfile(
+                company_id=company_data.get('id', 0),
+                name=company_data.get('name', ''),
+                industry=company_data.get('industry', ''),
+                scale=row_scale,
+                business_status=company_data.get('business_status', ''),
+                operation_score=row_operation,
+                financial_score=row_financial,
+                credit_score=row_credit,
+                risk_level=row_risk_level,
+                risk_tags=risk_tags,
+                tags=self._generate_tags(company_data, scale=row_scale),
+                recommended=row_recommended,
+                priority=row_priority,
+            ))
+
+        return profiles
+
+    @staticmethod
+    def _numeric_column(df: pd.DataFrame, name: str) -> np.ndarray:
+        """取数值列，缺失值按0处理"""
+        if name not in df.columns:
+            return np.zeros(len(df))
+        return pd.to_numeric(df[name], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+    @staticmethod
+    def _text_column(df: pd.DataFrame, name: str) -> pd.Series:
+        """取文本列，缺失值按空字符串处理"""
+        if name not in df.columns:
+            return pd.Series('', index=df.index)
+        return df[name].where(df[name].notna(), '')
+
     def _determine_scale(self, company_data: Dict[str, Any]) -> str:
         """确定企业规模"""
         # 根据行业和从业人员、营业收入等指标确定
@@ -131,16 +265,21 @@ class CompanyProfileBuilder:
         else:
             return '微型'
 
-    def _calculate_operation_score(self, company_data: Dict[str, Any]) -> float:
+    @staticmethod
+    def _years_since(establishment_date: Any) -> Optional[float]:
+        """计算成立年限，未提供成立日期时返回None"""
+        if establishment_date is None:
+            return None
+        if isinstance(establishment_date, str):
+            establishment_date = datetime.fromisoformat(establishment_date)
+        return (datetime.now() - establishment_date).days / 365
+
+    def _calculate_operation_score(self, company_data: Dict[str, Any], years: Optional[float]) -> float:
         """计算经营得分"""
         score = 50.0  # 基础分
 
         # 成立年限 (0-20分)
-        if 'establishment_date' in company_data:
-            establishment_date = company_data['establishment_date']
-            if isinstance(establishment_date, str):
-                establishment_date = datetime.fromisoformat(establishment_date)
-            years = (datetime.now() - establishment_date).days / 365
+        if years is not None:
             score += min(years * 2, 20)
 
         # 经营状态 (0-30分)
@@ -198,7 +337,7 @@ class CompanyProfileBuilder:
 
         return min(score, 100.0)
 
-    def _assess_risk(self, company_data: Dict[str, Any]) -> tuple:
+    def _assess_risk(self, company_data: Dict[str, Any], years: Optional[float]) -> tuple:
         """评估风险等级"""
         risk_tags = []
         risk_score = 0
@@ -210,14 +349,9 @@ class CompanyProfileBuilder:
             risk_tags.append('经营异常')
 
         # 成立时间风险
-        if 'establishment_date' in company_data:
-            establishment_date = company_data['establishment_date']
-            if isinstance(establishment_date, str):
-                establishment_date = datetime.fromisoformat(establishment_date)
-            years = (datetime.now() - establishment_date).days / 365
-            if years < 1:
-                risk_score += 20
-                risk_tags.append('新成立企业')
+        if years is not None and years < 1:
+            risk_score += 20
+            risk_tags.append('新成立企业')
 
         # 注册资本风险
         capital = company_data.get('registered_capital', 0)
@@ -238,7 +372,7 @@ class CompanyProfileBuilder:
 
         return risk_level, risk_tags
 
-    def _generate_tags(self, company_data: Dict[str, Any]) -> List[str]:
+    def _generate_tags(self, company_data: Dict[str, Any], scale: Optional[str] = None) -> List[str]:
         """生成标签"""
         tags = []
 
@@ -256,8 +390,7 @@ class CompanyProfileBuilder:
             tags.append(city)
 
         # 规模标签
-        scale = self._determine_scale(company_data)
-        tags.append(scale)
+        tags.append(scale if scale is not None else self._determine_scale(company_data))
 
         # 特殊标签
         if company_data.get('listed', False):
@@ -308,9 +441,19 @@ class CompanyProfileBuilder:
 class CompanyClusterAnalyzer:
     """企业聚类分析器"""
 
+    # 样本数达到该阈值时改用MiniBatchKMeans
+    MINIBATCH_THRESHOLD = 5000
+
     def __init__(self, n_clusters: int = 5):
         self.n_clusters = n_clusters
-        self.kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+        self.scaler = StandardScaler()
+        self.kmeans = self._create_kmeans(0)
+
+    def _create_kmeans(self, n_samples: int):
+        """根据样本量选择聚类器，大样本使用MiniBatchKMeans"""
+        if n_samples >= self.MINIBATCH_THRESHOLD:
+            return MiniBatchKMeans(n_clusters=self.n_clusters, batch_size=1024, n_init=3, random_state=42)
+        return KMeans(n_clusters=self.n_clusters, random_state=42)
 
     def cluster_companies(self, companies: List[Dict[str, Any]]) -> Dict[int, List[int]]:
         """
@@ -340,10 +483,11 @@ class CompanyClusterAnalyzer:
             company_ids.append(company.get('id'))
 
         # 标准化
-        features_array = np.array(features)
+        features_array = np.array(features, dtype=np.float32)
         features_scaled = self.scaler.fit_transform(features_array)
 
-        # 聚类
+        # 聚类（每次按本次样本量重新选择聚类器）
+        self.kmeans = self._create_kmeans(len(companies))
         clusters = self.kmeans.fit_predict(features_scaled)
 
         # 组织结果
@@ -380,7 +524,7 @@ def build_company_profile(company_data: Dict[str, Any]) -> CompanyProfile:
 def batch_build_profiles(companies_data: List[Dict[str, Any]]) -> List[CompanyProfile]:
     """批量构建企业画像"""
     builder = CompanyProfileBuilder()
-    return [builder.build_profile(data) for data in companies_data]
+    return builder.build_profiles(companies_data)
 
 
 def cluster_companies(companies: List[Dict[str, Any]], n_clusters: int = 5) -> Dict[int, List[int]]:
@@ -2,16 +2,201 @@
 客户意向评分模块
 基于多维度分析客户购买意向
 """
+import math
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from functools import cached_property
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime
 from loguru import logger
 
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-import jieba
-import jieba.analyse
+import pandas as pd
+
+try:
+    import ahocorasick  # 可选依赖：多模式匹配自动机
+except ImportError:
+    ahocorasick = None
+
+try:
+    from numba import njit, prange  # 可选依赖：批量评分内核JIT编译
+except ImportError:
+    njit = None
+
+
+def _parse_dates(values) -> np.ndarray:
+    """
+    一次性解析ISO格式时间为datetime64[ns]数组
+
+    不带时区的时间按原值（本地时间）处理；带时区的时间统一换算为UTC后去掉时区。
+    """
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), format='ISO8601', utc=True)
+    return parsed.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+
+
+def _preprocess_interactions(interactions: List[Dict[str, Any]]) -> tuple:
+    """
+    将互动记录一次性转换为数组
+
+    Returns:
+        (互动类型数组, datetime64[ns]日期数组, 意向度数组)
+    """
+    types = np.array([i.get('interaction_type', 'email') for i in interactions], dtype=object)
+    dates = _parse_dates([i['interaction_date'] for i in interactions])
+    interest = np.fromiter(
+        (i.get('interest_level') or 0 for i in interactions), dtype=np.float64, count=len(interactions)
+    )
+    return types, dates, interest
+
+
+def _recent_mask(dates: np.ndarray, days: int = 30) -> np.ndarray:
+    """最近days天内的互动掩码"""
+    return dates > np.datetime64(datetime.now(), 'ns') - np.timedelta64(days, 'D')
+
+
+_EXP = math.exp
+
+
+def _predict_purchase_probability_vec(scores: np.ndarray) -> np.ndarray:
+    """按综合得分数组预测购买概率（sigmoid）"""
+    return 1.0 / (1.0 + np.exp(-(scores - 50.0) / 15.0))
+
+
+# 意向等级：得分落在[0,60)、[60,80)、[80,100]分别编码为0低、1中、2高
+_LEVEL_BINS = (60.0, 80.0)
+_INTENT_LEVELS = np.array(['低', '中', '高'], dtype=object)
+
+# 时效加分：距最近互动 ≤7/≤30/≤90/≤180天 及更久
+_TIMING_BINS = (7, 30, 90, 180)
+_TIMING_BONUS = (40, 30, 20, 10, 0)
+
+# 关键因素：第0~3位分别表示行为/内容/互动/时效得分达到阈值，按位掩码查表
+_FACTOR_THRESHOLD = 70
+_FACTOR_NAMES = ('行为活跃', '内容相关度高', '互动频繁', '近期有互动')
+_FACTOR_TABLE = tuple(
+    tuple(name for bit, name in enumerate(_FACTOR_NAMES) if mask >> bit & 1) or ('需要培养',)
+    for mask in range(1 << len(_FACTOR_NAMES))
+)
+
+
+def _factor_masks(
+    behavior: np.ndarray,
+    content: np.ndarray,
+    interaction: np.ndarray,
+    timing: np.ndarray,
+) -> np.ndarray:
+    """计算各企业关键因素的位掩码（uint8）"""
+    return (
+        (behavior >= _FACTOR_THRESHOLD).astype(np.uint8)
+        | (content >= _FACTOR_THRESHOLD).astype(np.uint8) << 1
+        | (interaction >= _FACTOR_THRESHOLD).astype(np.uint8) << 2
+        | (timing >= _FACTOR_THRESHOLD).astype(np.uint8) << 3
+    )
+
+
+# numba内核是否可用（加载或编译失败后置为False，改用NumPy实现）
+_jit_enabled = njit is not None
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _combine_kernel(b, c, i, t, wb, wc, wi, wt, out_overall, out_prob, out_level):
+        """综合得分、购买概率与等级（单次并行循环）"""
+        for k in prange(b.shape[0]):
+            s = wb * b[k] + wc * c[k] + wi * i[k] + wt * t[k]
+            out_overall[k] = s
+            out_prob[k] = 1.0 / (1.0 + math.exp(-(s - 50.0) / 15.0))
+            out_level[k] = 0 if s < 60.0 else (1 if s < 80.0 else 2)
+
+
+def _combine_scores(scores: tuple, weights: tuple, use_jit: bool = False) -> tuple:
+    """
+    合成综合得分
+
+    Args:
+        scores: (行为分, 内容分, 互动分, 时效分) 数组
+        weights: 对应权重
+        use_jit: 是否使用numba内核（未安装numba时忽略）
+
+    Returns:
+        (综合得分, 购买概率, 等级编码)
+    """
+    global _jit_enabled
+    b, c, i, t = (np.ascontiguousarray(score, dtype=np.float64) for score in scores)
+    wb, wc, wi, wt = weights
+
+    if use_jit and _jit_enabled:
+        n = b.shape[0]
+        overall = np.empty(n)
+        probability = np.empty(n)
+        level = np.empty(n, dtype=np.int8)
+        try:
+            _combine_kernel(b, c, i, t, wb, wc, wi, wt, overall, probability, level)
+            return overall, probability, level
+        except Exception as e:
+            # 如磁盘缓存过期（模块改名后反序列化失败）或编译失败
+            logger.warning(f"numba内核不可用，改用NumPy实现: {e}")
+            _jit_enabled = False
+
+    overall = b * wb + c * wc + i * wi + t * wt
+    probability = _predict_purchase_probability_vec(overall)
+    level = np.searchsorted(_LEVEL_BINS, overall, side='right')
+    return overall, probability, level
+
+
+# jieba词典只初始化一次（并发首个请求时避免重复加载）
+_jieba_lock = threading.Lock()
+_jieba_initialized = False
+
+
+def _load_jieba_analyse():
+    """导入并初始化jieba，返回jieba.analyse模块"""
+    global _jieba_initialized
+    import jieba
+    import jieba.analyse
+
+    if not _jieba_initialized:
+        with _jieba_lock:
+            if not _jieba_initialized:
+                jieba.initialize()
+                _jieba_initialized = True
+    return jieba.analyse
+
+
+# ASCII文本的分词规则（按非字母数字切分）
+_ASCII_SPLIT_RE = re.compile(r'[^a-z0-9]+')
+
+
+def _extract_keywords(content: str, top_k: int = 20) -> List[str]:
+    """
+    提取内容关键词
+
+    纯ASCII文本按词频取前top_k个，不加载jieba；
+    含中文等非ASCII字符时才导入jieba做TF-IDF提取（首次导入需加载词典）。
+    """
+    if content.isascii():
+        tokens = [token for token in _ASCII_SPLIT_RE.split(content.lower()) if token]
+        return [token for token, _ in Counter(tokens).most_common(top_k)]
+
+    return _load_jieba_analyse().extract_tags(content, topK=top_k)
+
+
+def _build_keyword_automaton(high_keywords: List[str], medium_keywords: List[str]):
+    """构建意向关键词的Aho-Corasick自动机，值为(等级, 关键词)（未安装pyahocorasick时返回None）"""
+    if ahocorasick is None:
+        return None
+
+    automaton = ahocorasick.Automaton()
+    for keyword in high_keywords:
+        automaton.add_word(keyword, ('H', keyword))
+    for keyword in medium_keywords:
+        # 同一个词同时出现在两个列表时保留两个等级
+        tags = automaton.get(keyword, None)
+        automaton.add_word(keyword, ('M', keyword) if tags is None else ('HM', keyword))
+    automaton.make_automaton()
+    return automaton
 
 
 @dataclass
@@ -60,6 +245,70 @@ class IntentScore:
         }
 
 
+@dataclass
+class IntentScoreBatch:
+    """
+    批量意向评分（按列存储）
+
+    每个字段是一列，长度等于企业数；按下标访问或迭代时才生成单个IntentScore。
+    """
+    company_ids: np.ndarray
+    company_names: np.ndarray
+    overall_scores: np.ndarray
+    behavior_scores: np.ndarray
+    content_scores: np.ndarray
+    interaction_scores: np.ndarray
+    timing_scores: np.ndarray
+    intent_levels: np.ndarray
+    key_factors: List[List[str]]
+    purchase_probabilities: np.ndarray
+    next_actions: np.ndarray
+    recommended_channels: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.company_ids)
+
+    def __getitem__(self, index: int) -> IntentScore:
+        return IntentScore(
+            company_id=self.company_ids[index].item(),
+            company_name=self.company_names[index],
+            overall_score=self.overall_scores[index].item(),
+            behavior_score=self.behavior_scores[index].item(),
+            content_score=self.content_scores[index].item(),
+            interaction_score=self.interaction_scores[index].item(),
+            timing_score=self.timing_scores[index].item(),
+            intent_level=self.intent_levels[index],
+            key_factors=self.key_factors[index],
+            purchase_probability=self.purchase_probabilities[index].item(),
+            next_action=self.next_actions[index],
+            recommended_channel=self.recommended_channels[index],
+        )
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def to_records(self) -> pd.DataFrame:
+        """转换为DataFrame，列名与IntentScore.to_dict一致"""
+        return pd.DataFrame({
+            'company_id': self.company_ids,
+            'company_name': self.company_names,
+            'overall_score': self.overall_scores,
+            'behavior_score': self.behavior_scores,
+            'content_score': self.content_scores,
+            'interaction_score': self.interaction_scores,
+            'timing_score': self.timing_scores,
+            'intent_level': self.intent_levels,
+            'key_factors': self.key_factors,
+            'purchase_probability': self.purchase_probabilities,
+            'next_action': self.next_actions,
+            'recommended_channel': self.recommended_channels,
+        }, copy=False)
+
+    def to_dict_list(self) -> List[Dict[str, Any]]:
+        """转换为字典列表"""
+        return self.to_records().to_dict(orient='records')
+
+
 class IntentScoreModel:
     """意向评分模型"""
 
@@ -83,9 +332,33 @@ class IntentScoreModel:
         '比较', '选型', '考察',
     ]
 
-    def __init__(self):
-        self.scaler = StandardScaler()
-        self.rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
+    _KEYWORD_AUTOMATON = _build_keyword_automaton(HIGH_INTENT_KEYWORDS, MEDIUM_INTENT_KEYWORDS)
+    _HIGH_INTENT_SET = frozenset(HIGH_INTENT_KEYWORDS)
+    _MEDIUM_INTENT_SET = frozenset(MEDIUM_INTENT_KEYWORDS)
+
+    # 批量评分超过该规模时使用numba内核合成得分
+    JIT_BATCH_THRESHOLD = 10000
+
+    # 互动类型权重
+    INTERACTION_WEIGHTS = {
+        'meeting': 20,
+        'call': 15,
+        'visit': 25,
+        'email': 10,
+        'social': 5,
+    }
+
+    @cached_property
+    def scaler(self):
+        """特征标准化器（按需创建，评分规则不依赖它）"""
+        from sklearn.preprocessing import StandardScaler
+        return StandardScaler()
+
+    @cached_property
+    def rf_model(self):
+        """随机森林分类器（预留给基于训练数据的概率预测，按需创建）"""
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(n_estimators=100, random_state=42)
 
     def calculate_intent_score(
         self,
@@ -104,17 +377,21 @@ class IntentScoreModel:
         Returns:
             IntentScore对象
         """
+        # 0. 互动记录只解析一次
+        types, dates, interest = _preprocess_interactions(interactions or [])
+        recent = _recent_mask(dates)
+
         # 1. 计算行为意向分
-        behavior_score = self._calculate_behavior_score(company_data, interactions or [])
+        behavior_score = self._calculate_behavior_score(company_data, recent)
 
         # 2. 计算内容意向分
         content_score = self._calculate_content_score(website_content or '')
 
         # 3. 计算互动意向分
-        interaction_score = self._calculate_interaction_score(interactions or [])
+        interaction_score = self._calculate_interaction_score(types, recent, interest)
 
         # 4. 计算时效意向分
-        timing_score = self._calculate_timing_score(company_data, interactions or [])
+        timing_score = self._calculate_timing_score(company_data, dates)
 
         # 5. 计算综合得分
         overall_score = (
@@ -137,7 +414,7 @@ class IntentScoreModel:
 
         # 9. 生成建议
         next_action, recommended_channel = self._generate_recommendations(
-            intent_level, key_factors, interactions or []
+            intent_level, key_factors, types
         )
 
         return IntentScore(
@@ -155,28 +432,155 @@ class IntentScoreModel:
             recommended_channel=recommended_channel,
         )
 
-    def _calculate_behavior_score(self, company_data: Dict[str, Any], interactions: List[Dict]) -> float:
+    def calculate_intent_scores(
+        self,
+        companies_data: List[Dict[str, Any]],
+        interactions_map: Dict[int, List[Dict]] = None,
+        content_map: Dict[int, str] = None,
+    ) -> IntentScoreBatch:
+        """
+        批量计算意向评分
+
+        所有企业的互动记录合并为一张表，日期一次性解析，
+        各维度得分按列向量化计算，规则与calculate_intent_score一致。
+
+        Args:
+            companies_data: 企业数据列表
+            interactions_map: 企业ID -> 互动记录列表
+            content_map: 企业ID -> 网站内容
+
+        Returns:
+            IntentScoreBatch，顺序与companies_data一致
+        """
+        n = len(companies_data)
+
+        company_ids = [company.get('id') for company in companies_data]
+
+        # 1. 合并互动记录，row为所属企业在companies_data中的位置
+        interaction_lists = [
+            interactions_map.get(company_id, []) if interactions_map else []
+            for company_id in company_ids
+        ]
+        counts = np.array([len(items) for items in interaction_lists], dtype=np.int64)
+        types, dates, interest = _preprocess_interactions(
+            [item for items in interaction_lists for item in items]
+        )
+        row = np.repeat(np.arange(n), counts)
+
+        now = np.datetime64(datetime.now(), 'ns')
+        recent = dates > now - np.timedelta64(30, 'D')
+        recent_count = np.bincount(row[recent], minlength=n)
+        has_interactions = counts > 0
+
+        # 2. 行为意向分
+        scopes = [company.get('business_scope') or '' for company in companies_data]
+        keyword_counts = np.array([self._count_intent_keywords(scope) for scope in scopes]).reshape(n, 2)
+        has_website = np.array([bool(company.get('website')) for company in companies_data])
+        behavior_score = (
+            np.minimum(keyword_counts[:, 0] * 10, 40)
+            + np.minimum(keyword_counts[:, 1] * 5, 20)
+            + np.minimum(recent_count * 5, 30)
+            + has_website * 10
+        )
+        behavior_score = np.minimum(behavior_score, 100.0)
+
+        # 3. 内容意向分（关键词提取逐条进行）
+        content_score = np.array([
+            self._calculate_content_score((content_map.get(company_id) if content_map else None) or '')
+            for company_id in company_ids
+        ], dtype=float)
+
+        # 4. 互动意向分
+        type_weights = pd.Series(types).map(self.INTERACTION_WEIGHTS).fillna(5).clip(upper=25).to_numpy(dtype=float)
+        rated = recent & (interest != 0)
+        interest_count = np.bincount(row[rated], minlength=n)
+        interest_sum = np.bincount(row[rated], weights=interest[rated], minlength=n)
+        avg_interest = np.divide(interest_sum, interest_count, out=np.zeros(n), where=interest_count > 0)
+        interaction_score = (
+            np.minimum(recent_count * 8, 40)
+            + np.bincount(row[recent], weights=type_weights[recent], minlength=n)
+            + avg_interest * 10
+        )
+        interaction_score = np.where(has_interactions, np.minimum(interaction_score, 100.0), 0.0)
+
+        # 5. 时效意向分
+        latest = np.full(n, now, dtype='datetime64[ns]')
+        if row.size:
+            latest_by_row = pd.Series(dates).groupby(row).max()
+            latest[latest_by_row.index.to_numpy()] = latest_by_row.to_numpy()
+        days_since_contact = (now - latest) // np.timedelta64(1, 'D')
+        timing_bonus = np.take(_TIMING_BONUS, np.searchsorted(_TIMING_BINS, days_since_contact, side='left'))
+        timing_score = np.minimum(50.0 + np.where(has_interactions, timing_bonus, 0), 100.0)
+
+        # 6. 综合得分、等级与购买概率
+        overall_score, purchase_probability, level_code = _combine_scores(
+            (behavior_score, content_score, interaction_score, timing_score),
+            (self.WEIGHTS['behavior'], self.WEIGHTS['content'],
+             self.WEIGHTS['interaction'], self.WEIGHTS['timing']),
+            use_jit=n >= self.JIT_BATCH_THRESHOLD,
+        )
+        intent_level = _INTENT_LEVELS[level_code]
+        factor_mask = _factor_masks(behavior_score, content_score, interaction_score, timing_score)
+
+        # 最近30条互动中是否有会议（按记录顺序）
+        position = np.arange(row.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        in_last_30 = position >= counts[row] - 30
+        is_meeting = types == 'meeting'
+        has_recent_meeting = np.bincount(row[in_last_30 & is_meeting], minlength=n) > 0
+
+        # 7. 行动建议：按 (等级, 是否已会面) 查表
+        recommendations = np.array(
+            [self._recommend(level, met) for level in _INTENT_LEVELS for met in (False, True)],
+            dtype=object,
+        ).reshape(len(_INTENT_LEVELS) * 2, 2)
+        recommendation = recommendations[np.asarray(level_code, dtype=np.intp) * 2 + has_recent_meeting]
+
+        # 8. 按列组装结果
+        return IntentScoreBatch(
+            company_ids=np.array([company.get('id', 0) for company in companies_data], dtype=np.int64),
+            company_names=np.array([company.get('name', '') for company in companies_data], dtype=object),
+            overall_scores=np.round(overall_score, 2),
+            behavior_scores=np.round(behavior_score, 2),
+            content_scores=np.round(content_score, 2),
+            interaction_scores=np.round(interaction_score, 2),
+            timing_scores=np.round(timing_score, 2),
+            intent_levels=intent_level,
+            key_factors=[list(_FACTOR_TABLE[mask]) for mask in factor_mask.tolist()],
+            purchase_probabilities=np.round(purchase_probability, 2),
+            next_actions=recommendation[:, 0],
+            recommended_channels=recommendation[:, 1],
+        )
+
+    def _count_intent_keywords(self, text: str) -> tuple:
+        """统计文本中出现的高/中意向关键词个数（同一关键词只计一次）"""
+        if self._KEYWORD_AUTOMATON is None:
+            high_intent_count = sum(1 for keyword in self.HIGH_INTENT_KEYWORDS if keyword in text)
+            medium_intent_count = sum(1 for keyword in self.MEDIUM_INTENT_KEYWORDS if keyword in text)
+            return high_intent_count, medium_intent_count
+
+        # 一次线性扫描得到所有命中（含重叠，如“采购计划”同时命中“采购”）
+        matched = {value for _, value in self._KEYWORD_AUTOMATON.iter(text)}
+        high_intent_count = sum(1 for tags, _ in matched if 'H' in tags)
+        medium_intent_count = sum(1 for tags, _ in matched if 'M' in tags)
+        return high_intent_count, medium_intent_count
+
+    def _calculate_behavior_score(self, company_data: Dict[str, Any], recent: np.ndarray) -> float:
         """计算行为意向分"""
         score = 0.0
 
         # 检查是否有采购相关行为
         business_scope = company_data.get('business_scope', '')
 
+        high_intent_count, medium_intent_count = self._count_intent_keywords(business_scope)
+
         # 高意向行为
-        high_intent_count = sum(1 for keyword in self.HIGH_INTENT_KEYWORDS if keyword in business_scope)
         score += min(high_intent_count * 10, 40)
 
         # 中意向行为
-        medium_intent_count = sum(1 for keyword in self.MEDIUM_INTENT_KEYWORDS if keyword in business_scope)
         score += min(medium_intent_count * 5, 20)
 
-        # 互动频率
-        if interactions:
-            recent_interactions = [
-                i for i in interactions
-                if datetime.fromisoformat(i['interaction_date'].replace('Z', '+00:00')) > datetime.now() - timedelta(days=30)
-            ]
-            score += min(len(recent_interactions) * 5, 30)
+        # 互动频率（最近30天）
+        score += min(int(np.count_nonzero(recent)) * 5, 30)
 
         # 网站活跃度
         if company_data.get('website'):
@@ -191,12 +595,12 @@ class IntentScoreModel:
 
         score = 0.0
 
-        # 使用jieba提取关键词
-        keywords = jieba.analyse.extract_tags(content, topK=20)
+        # 提取关键词
+        keywords = _extract_keywords(content, top_k=20)
 
         # 计算意向关键词权重
-        high_intent_matches = sum(1 for kw in keywords if kw in self.HIGH_INTENT_KEYWORDS)
-        medium_intent_matches = sum(1 for kw in keywords if kw in self.MEDIUM_INTENT_KEYWORDS)
+        high_intent_matches = sum(1 for kw in keywords if kw in self._HIGH_INTENT_SET)
+        medium_intent_matches = sum(1 for kw in keywords if kw in self._MEDIUM_INTENT_SET)
 
         score += min(high_intent_matches * 15, 60)
         score += min(medium_intent_matches * 10, 30)
@@ -209,80 +613,54 @@ class IntentScoreModel:
 
         return min(score, 100.0)
 
-    def _calculate_interaction_score(self, interactions: List[Dict]) -> float:
+    def _calculate_interaction_score(
+        self,
+        types: np.ndarray,
+        recent: np.ndarray,
+        interest: np.ndarray,
+    ) -> float:
         """计算互动意向分"""
-        if not interactions:
+        if not len(types):
             return 0.0
 
         score = 0.0
 
-        # 最近30天的互动
-        recent_interactions = [
-            i for i in interactions
-            if datetime.fromisoformat(i['interaction_date'].replace('Z', '+00:00')) > datetime.now() - timedelta(days=30)
-        ]
-
-        # 互动频率
-        score += min(len(recent_interactions) * 8, 40)
+        # 互动频率（最近30天）
+        score += min(int(np.count_nonzero(recent)) * 8, 40)
 
         # 互动类型权重
-        interaction_weights = {
-            'meeting': 20,
-            'call': 15,
-            'visit': 25,
-            'email': 10,
-            'social': 5,
-        }
-
-        for interaction in recent_interactions:
-            interaction_type = interaction.get('interaction_type', 'email')
-            weight = interaction_weights.get(interaction_type, 5)
+        for interaction_type in types[recent]:
+            weight = self.INTERACTION_WEIGHTS.get(interaction_type, 5)
             score += min(weight, 25)
 
         # 意向度评分
-        interest_levels = [i.get('interest_level', 0) for i in recent_interactions if i.get('interest_level')]
-        if interest_levels:
-            avg_interest = sum(interest_levels) / len(interest_levels)
-            score += avg_interest * 10
+        interest_levels = interest[recent]
+        interest_levels = interest_levels[interest_levels != 0]
+        if interest_levels.size:
+            score += float(interest_levels.mean()) * 10
 
         return min(score, 100.0)
 
-    def _calculate_timing_score(self, company_data: Dict[str, Any], interactions: List[Dict]) -> float:
+    def _calculate_timing_score(self, company_data: Dict[str, Any], dates: np.ndarray) -> float:
         """计算时效意向分"""
         score = 50.0  # 基础分
 
-        if not interactions:
+        if not dates.size:
             return score
 
         # 最近互动时间
-        latest_interaction = max(
-            interactions,
-            key=lambda x: datetime.fromisoformat(x['interaction_date'].replace('Z', '+00:00'))
+        days_since_contact = int(
+            (np.datetime64(datetime.now(), 'ns') - dates.max()) // np.timedelta64(1, 'D')
         )
-        days_since_contact = (
-            datetime.now() - datetime.fromisoformat(latest_interaction['interaction_date'].replace('Z', '+00:00'))
-        ).days
 
         # 时间衰减
-        if days_since_contact <= 7:
-            score += 40
-        elif days_since_contact <= 30:
-            score += 30
-        elif days_since_contact <= 90:
-            score += 20
-        elif days_since_contact <= 180:
-            score += 10
+        score += _TIMING_BONUS[bisect_left(_TIMING_BINS, days_since_contact)]
 
         return min(score, 100.0)
 
     def _determine_intent_level(self, score: float) -> str:
         """确定意向等级"""
-        if score >= 80:
-            return '高'
-        elif score >= 60:
-            return '中'
-        else:
-            return '低'
+        return _INTENT_LEVELS[bisect_right(_LEVEL_BINS, score)]
 
     def _extract_key_factors(
         self,
@@ -291,40 +669,34 @@ class IntentScoreModel:
         interaction_score: float,
         timing_score: float,
     ) -> List[str]:
-        """提取关键影响因素"""
-        factors = []
-
-        if behavior_score >= 70:
-            factors.append('行为活跃')
-        if content_score >= 70:
-            factors.append('内容相关度高')
-        if interaction_score >= 70:
-            factors.append('互动频繁')
-        if timing_score >= 70:
-            factors.append('近期有互动')
-
-        # 如果所有分数都低，添加提示
-        if not factors:
-            factors.append('需要培养')
-
-        return factors
+        """提取关键影响因素（所有分数都低时为“需要培养”）"""
+        mask = (
+            (behavior_score >= _FACTOR_THRESHOLD)
+            | (content_score >= _FACTOR_THRESHOLD) << 1
+            | (interaction_score >= _FACTOR_THRESHOLD) << 2
+            | (timing_score >= _FACTOR_THRESHOLD) << 3
+        )
+        return list(_FACTOR_TABLE[mask])
 
     def _predict_purchase_probability(self, intent_score: float) -> float:
         """预测购买概率"""
         # 使用sigmoid函数将分数映射到0-1概率
-        import math
-        probability = 1 / (1 + math.exp(-(intent_score - 50) / 15))
-        return probability
+        return 1.0 / (1.0 + _EXP(-(intent_score - 50.0) / 15.0))
 
     def _generate_recommendations(
         self,
         intent_level: str,
         key_factors: List[str],
-        interactions: List[Dict],
+        types: np.ndarray,
     ) -> tuple:
         """生成下一步行动建议"""
+        has_recent_meeting = any(interaction_type == 'meeting' for interaction_type in types[-30:])
+        return self._recommend(intent_level, has_recent_meeting)
+
+    def _recommend(self, intent_level: str, has_recent_meeting: bool) -> tuple:
+        """根据意向等级和最近是否已会面给出建议"""
         if intent_level == '高':
-            if 'meeting' not in [i.get('interaction_type') for i in interactions[-30:]]:
+            if not has_recent_meeting:
                 next_action = '安排上门拜访或视频会议'
                 recommended_channel = 'meeting'
             else:
@@ -347,7 +719,7 @@ def calculate_intent_score(
     website_content: str = None,
 ) -> IntentScore:
     """计算意向评分"""
-    model = IntentScoreModel()
+    model = get_intent_model()
     return model.calculate_intent_score(company_data, interactions, website_content)
 
 
@@ -355,17 +727,29 @@ def batch_calculate_scores(
     companies_data: List[Dict[str, Any]],
     interactions_map: Dict[int, List[Dict]] = None,
     content_map: Dict[int, str] = None,
-) -> List[IntentScore]:
+) -> IntentScoreBatch:
     """批量计算意向评分"""
-    model = IntentScoreModel()
-    results = []
+    model = get_intent_model()
+    return model.calculate_intent_scores(companies_data, interactions_map, content_map)
+
+
+def warm_up():
+    """预热：加载jieba词典与IDF，并创建模型实例（在服务启动时调用）"""
+    _load_jieba_analyse()
+    get_intent_model()
+
+    # 触发numba内核编译，避免首个大批量请求承担编译耗时
+    zeros = np.zeros(1)
+    _combine_scores((zeros, zeros, zeros, zeros), (0.0, 0.0, 0.0, 0.0), use_jit=True)
+
 
-    for company in companies_data:
-        company_id = company.get('id')
-        interactions = interactions_map.get(company_id, []) if interactions_map else []
-        content = content_map.get(company_id) if content_map else None
+# 全局实例
+_intent_model = None
 
-        score = model.calculate_intent_score(company, interactions, content)
-        results.append(score)
 
-    return results
+def get_intent_model() -> IntentScoreModel:
+    """获取意向评分模型实例"""
+    global _intent_model
+    if _intent_model is None:
+        _intent_model = IntentScoreModel()
+    return _intent_model
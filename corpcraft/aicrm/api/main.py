@@ -4,13 +4,32 @@ AICRM FastAPI 主应用
 """
 from fastapi import FastAPI, Depends, HTTPException, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from datetime import datetime
+from itertools import groupby
+from operator import attrgetter
 from loguru import logger
+import orjson
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
 from config.settings import settings
-from storage.database import get_db_manager, get_db
+
+# sklearn加速补丁需在任何sklearn估计器导入之前应用
+if settings.SKLEARNEX_ENABLED:
+    try:
+        from sklearnex import patch_sklearn
+        patch_sklearn()
+    except ImportError:
+        pass
+
+from storage.database import (
+    DatabaseManager, get_db_manager, get_db, get_async_db,
+    build_company_search, build_recent_companies,
+)
 from storage.models import (
     Company, CompanyCreate, CompanyUpdate, CompanyResponse,
     Contact, ContactCreate, ContactResponse,
@@ -22,15 +41,17 @@ app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="AI驱动的智能CRM系统",
+    default_response_class=ORJSONResponse,
 )
 
 # CORS中间件配置
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # 生产环境应该限制具体域名
+    allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=86400,  # 浏览器缓存预检结果一天
 )
 
 
@@ -48,6 +69,10 @@ async def startup_event():
     from storage.database import init_async_databases
     await init_async_databases()
 
+    # 预热意向评分模型（jieba词典加载较慢，避免由首个请求承担）
+    from analyzers.intent_score import warm_up
+    warm_up()
+
     logger.info("AICRM API服务启动完成")
 
 
@@ -85,44 +110,62 @@ async def health_check():
 # ==================== 企业相关接口 ====================
 
 @app.post("/api/v1/companies", response_model=CompanyResponse)
-async def create_company(company: CompanyCreate):
+async def create_company(
+    company: CompanyCreate,
+    session: AsyncSession = Depends(get_async_db),
+):
     """创建企业"""
-    db = get_db_manager()
     try:
-        db_company = db.create_company(company)
-        return CompanyResponse.from_orm(db_company)
+        db_company = Company(**company.model_dump())
+        session.add(db_company)
+        await session.commit()
+        await session.refresh(db_company)
+        logger.info(f"创建企业成功: {db_company.name}")
+        return db_company
     except Exception as e:
         logger.error(f"创建企业失败: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/v1/companies/{company_id}", response_model=CompanyResponse)
-async def get_company(company_id: int):
+async def get_company(company_id: int, session: AsyncSession = Depends(get_async_db)):
     """获取企业详情"""
-    db = get_db_manager()
-    db_company = db.get_company(company_id)
+    db_company = await session.get(Company, company_id)
     if not db_company:
         raise HTTPException(status_code=404, detail="企业不存在")
-    return CompanyResponse.from_orm(db_company)
+    return db_company
 
 
 @app.put("/api/v1/companies/{company_id}", response_model=CompanyResponse)
-async def update_company(company_id: int, company: CompanyUpdate):
+async def update_company(
+    company_id: int,
+    company: CompanyUpdate,
+    session: AsyncSession = Depends(get_async_db),
+):
     """更新企业信息"""
-    db = get_db_manager()
-    db_company = db.update_company(company_id, company)
+    db_company = await session.get(Company, company_id)
     if not db_company:
         raise HTTPException(status_code=404, detail="企业不存在")
-    return CompanyResponse.from_orm(db_company)
+
+    for key, value in company.model_dump(exclude_unset=True).items():
+        setattr(db_company, key, value)
+    db_company.updated_at = datetime.now()
+    await session.commit()
+    await session.refresh(db_company)
+    logger.info(f"更新企业成功: {db_company.name}")
+    return db_company
 
 
 @app.delete("/api/v1/companies/{company_id}")
-async def delete_company(company_id: int):
+async def delete_company(company_id: int, session: AsyncSession = Depends(get_async_db)):
     """删除企业"""
-    db = get_db_manager()
-    success = db.delete_company(company_id)
-    if not success:
+    db_company = await session.get(Company, company_id)
+    if not db_company:
         raise HTTPException(status_code=404, detail="企业不存在")
+
+    await session.delete(db_company)
+    await session.commit()
+    logger.info(f"删除企业成功: {company_id}")
     return {"message": "删除成功"}
 
 
@@ -134,10 +177,10 @@ async def search_companies(
     city: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_async_db),
 ):
     """搜索企业"""
-    db = get_db_manager()
-    companies = db.search_companies(
+    stmt = build_company_search(
         keyword=keyword,
         industry=industry,
         province=province,
@@ -145,14 +188,15 @@ async def search_companies(
         skip=skip,
         limit=limit,
     )
-    return [CompanyResponse.from_orm(c) for c in companies]
+    companies = (await session.execute(stmt)).scalars().all()
+    return companies
 
 
 @app.get("/api/v1/companies/stats/overview")
-async def get_company_stats():
+async def get_company_stats(db: DatabaseManager = Depends(get_db_manager)):
     """获取企业统计概览"""
-    db = get_db_manager()
-    stats = db.get_company_stats()
+    # 统计查询仍走同步会话，放到线程池执行避免阻塞事件循环
+    stats = await run_in_threadpool(db.get_company_stats)
     return stats
 
 
@@ -160,44 +204,50 @@ async def get_company_stats():
 async def get_recent_companies(
     days: int = Query(7, ge=1, le=365),
     limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(get_async_db),
 ):
     """获取最近添加的企业"""
-    db = get_db_manager()
-    companies = db.get_recent_companies(days=days, limit=limit)
-    return [CompanyResponse.from_orm(c) for c in companies]
+    companies = (await session.execute(build_recent_companies(days=days, limit=limit))).scalars().all()
+    return companies
 
 
 # ==================== 联系人相关接口 ====================
 
 @app.post("/api/v1/contacts", response_model=ContactResponse)
-async def create_contact(contact: ContactCreate):
+async def create_contact(
+    contact: ContactCreate,
+    session: AsyncSession = Depends(get_async_db),
+):
     """创建联系人"""
-    db = get_db_manager()
     try:
-        db_contact = db.create_contact(contact)
-        return ContactResponse.from_orm(db_contact)
+        db_contact = Contact(**contact.model_dump())
+        session.add(db_contact)
+        await session.commit()
+        await session.refresh(db_contact)
+        logger.info(f"创建联系人成功: {db_contact.name}")
+        return db_contact
     except Exception as e:
         logger.error(f"创建联系人失败: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.get("/api/v1/companies/{company_id}/contacts", response_model=List[ContactResponse])
-async def get_company_contacts(company_id: int):
+async def get_company_contacts(company_id: int, session: AsyncSession = Depends(get_async_db)):
     """获取企业联系人列表"""
-    db = get_db_manager()
-    contacts = db.get_contacts_by_company(company_id)
-    return [ContactResponse.from_orm(c) for c in contacts]
+    contacts = (await session.execute(
+        select(Contact).where(Contact.company_id == company_id)
+    )).scalars().all()
+    return contacts
 
 
 # ==================== 分析相关接口 ====================
 
 @app.post("/api/v1/analytics/company-profile/{company_id}")
-async def build_company_profile(company_id: int):
+async def build_company_profile(company_id: int, session: AsyncSession = Depends(get_async_db)):
     """构建企业画像"""
     from analyzers.company_profile import build_company_profile
 
-    db = get_db_manager()
-    company = db.get_company(company_id)
+    company = await session.get(Company, company_id)
 
     if not company:
         raise HTTPException(status_code=404, detail="企业不存在")
@@ -222,30 +272,103 @@ async def build_company_profile(company_id: int):
     return profile.to_dict()
 
 
-@app.post("/api/v1/analytics/intent-score/{company_id}")
-async def calculate_intent_score(company_id: int):
-    """计算客户意向评分"""
-    from analyzers.intent_score import calculate_intent_score
+# 批量评分单次请求的企业数上限
+INTENT_SCORE_BATCH_LIMIT = 500
 
-    db = get_db_manager()
-    company = db.get_company(company_id)
 
-    if not company:
-        raise HTTPException(status_code=404, detail="企业不存在")
-
-    # 获取互动记录
-    with db.get_session() as session:
-        interactions = session.query(Interaction).filter(
-            Interaction.company_id == company_id
-        ).all()
-        interactions_list = [
+@app.post("/api/v1/analytics/intent-score/batch")
+async def batch_calculate_intent_scores(
+    ids: List[int],
+    session: AsyncSession = Depends(get_async_db),
+):
+    """批量计算客户意向评分（两次批量查询 + 向量化评分）"""
+    from analyzers.intent_score import batch_calculate_scores
+
+    if len(ids) > INTENT_SCORE_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"单次最多评分{INTENT_SCORE_BATCH_LIMIT}家企业")
+
+    # 去重并保持请求顺序
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return ORJSONResponse([])
+
+    companies = (await session.execute(
+        select(Company).where(Company.id.in_(ids))
+    )).scalars().all()
+    interactions = (await session.execute(
+        select(Interaction)
+        .where(Interaction.company_id.in_(ids))
+        .order_by(Interaction.company_id, Interaction.id)
+    )).scalars().all()
+
+    interactions_map = {
+        company_id: [
             {
                 'interaction_type': i.interaction_type,
                 'interaction_date': i.interaction_date.isoformat(),
                 'interest_level': i.interest_level or 0,
             }
-            for i in interactions
+            for i in group
         ]
+        for company_id, group in groupby(interactions, key=attrgetter('company_id'))
+    }
+
+    companies_by_id = {
+        company.id: {
+            'id': company.id,
+            'name': company.name,
+            'business_scope': company.business_scope,
+            'website': company.website,
+        }
+        for company in companies
+    }
+
+    # 不存在的企业直接跳过
+    companies_data = [companies_by_id[company_id] for company_id in ids if company_id in companies_by_id]
+
+    scores = batch_calculate_scores(companies_data, interactions_map)
+
+    # 结果已是JSON原生类型，直接交给orjson序列化，跳过jsonable_encoder
+    return ORJSONResponse(scores.to_dict_list())
+
+
+@app.post("/api/v1/analytics/intent-score/{company_id}")
+async def calculate_intent_score(
+    company_id: int,
+    session: AsyncSession = Depends(get_async_db),
+    db: DatabaseManager = Depends(get_db_manager),
+):
+    """计算客户意向评分（按数据版本缓存）"""
+    from analyzers.intent_score import calculate_intent_score
+
+    # 数据未变化时直接返回缓存的JSON
+    version = await db.get_intent_score_version(session, company_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="企业不存在")
+
+    cached = await db.get_cached_intent_score(company_id, version)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    # 企业与互动记录一次查询取回（LEFT OUTER JOIN预加载）
+    stmt = (
+        select(Company)
+        .options(joinedload(Company.interactions))
+        .where(Company.id == company_id)
+    )
+    company = (await session.execute(stmt)).unique().scalar_one_or_none()
+
+    if not company:
+        raise HTTPException(status_code=404, detail="企业不存在")
+
+    interactions_list = [
+        {
+            'interaction_type': i.interaction_type,
+            'interaction_date': i.interaction_date.isoformat(),
+            'interest_level': i.interest_level or 0,
+        }
+        for i in company.interactions
+    ]
 
     # 转换为字典
     company_dict = {
@@ -256,7 +379,9 @@ async def calculate_intent_score(company_id: int):
     }
 
     score = calculate_intent_score(company_dict, interactions_list)
-    return score.to_dict()
+    payload = orjson.dumps(score.to_dict())
+    await db.cache_intent_score(company_id, version, payload)
+    return Response(content=payload, media_type="application/json")
 
 
 # ==================== 爬虫相关接口 ====================
@@ -37,6 +37,9 @@ class Settings(BaseSettings):
     REDIS_DB: int = 0
     REDIS_PASSWORD: Optional[str] = None
 
+    # 缓存配置
+    INTENT_SCORE_CACHE_TTL: int = 3600  # 意向评分缓存有效期（秒）
+
     # Celery配置
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
@@ -45,6 +48,7 @@ class Settings(BaseSettings):
     API_HOST: str = "0.0.0.0"
     API_PORT: int = 8000
     API_PREFIX: str = "/api/v1"
+    CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:8000"]  # 允许跨域的前端地址
 
     # JWT配置
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -74,6 +78,7 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_MODEL: str = "gpt-4-turbo-preview"
     ANTHROPIC_API_KEY: Optional[str] = None
+    SKLEARNEX_ENABLED: bool = True  # 安装scikit-learn-intelex时用oneDAL加速sklearn
 
     # 日志配置
     LOG_LEVEL: str = "INFO"
@@ -94,11 +99,22 @@ class Settings(BaseSettings):
         """PostgreSQL连接URL"""
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def postgres_async_url(self) -> str:
+        """PostgreSQL异步连接URL（asyncpg驱动）"""
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+
     @property
     def mongodb_url(self) -> str:
         """MongoDB连接URL"""
         return f"mongodb://{self.MONGODB_USER}:{self.MONGODB_PASSWORD}@{self.MONGODB_HOST}:{self.MONGODB_PORT}/{self.MONGODB_DB}"
 
+    @property
+    def redis_url(self) -> str:
+        """Redis连接URL"""
+        auth = f":{self.REDIS_PASSWORD}@" if self.REDIS_PASSWORD else ""
+        return f"redis://{auth}{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_DB}"
+
     @property
     def elasticsearch_url(self) -> str:
         """Elasticsearch连接URL"""
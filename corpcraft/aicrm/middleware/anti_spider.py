@@ -2,34 +2,122 @@
 反爬虫中间件
 实现User-Agent轮换、请求频率控制、Cookie管理等反爬虫策略
 """
+import os
 import random
 import time
-from typing import Dict, Set
-from urllib.parse import urlparse
+from functools import lru_cache
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict, defaultdict
+from typing import DefaultDict, Dict, Optional
+from urllib.parse import urlparse, urlsplit
 from loguru import logger
 from fake_useragent import UserAgent
 from scrapy import signals
 from scrapy.exceptions import NotConfigured
 from scrapy.downloadermiddlewares.retry import RetryMiddleware as ScrapyRetryMiddleware
 from w3lib.http import basic_auth_header
+from twisted.internet.task import deferLater
+from tldextract import TLDExtract
 from datetime import datetime, timedelta
 
 
+@lru_cache(maxsize=4096)
+def _url_netloc(url: str) -> str:
+    """获取域名（请求与对应响应、重试会重复解析同一URL，缓存结果）"""
+    return urlparse(url).netloc
+
+
+def _request_netloc(request) -> str:
+    """获取请求域名，结果存入meta供后续中间件复用（重定向后URL变化时重新解析）"""
+    cached = request.meta.get('_netloc')
+    if cached is not None and cached[0] is request.url:
+        return cached[1]
+    netloc = _url_netloc(request.url)
+    request.meta['_netloc'] = (request.url, netloc)
+    return netloc
+
+
+# 公共后缀解析（tldextract为scrapy依赖），只用内置的后缀表，不联网更新
+_split_domain = TLDExtract(suffix_list_urls=(), include_psl_private_domains=True)
+
+
+@lru_cache(maxsize=4096)
+def _cookie_domains(netloc: str) -> tuple:
+    """
+    可能匹配的Cookie域名，从可注册域名到主机按父域到子域排列:
+    a.b.example.com.cn -> (example.com.cn, b.example.com.cn, a.b.example.com.cn)
+
+    不含com.cn、co.uk等公共后缀，避免接受对整个后缀生效的Cookie；未知后缀按最后一级处理
+    """
+    host = urlsplit('//' + netloc).hostname or netloc
+    if host.replace('.', '').isdigit():
+        return (host,)
+
+    labels = host.split('.')
+    suffix = _split_domain(host).suffix
+    start = len(labels) - (suffix.count('.') + 2 if suffix else 2)
+    if start <= 0:
+        return (host,)
+    return tuple('.'.join(labels[i:]) for i in range(start, -1, -1))
+
+
+@lru_cache(maxsize=256)
+def _parse_http_date(value: str) -> float:
+    """解析HTTP-date为时间戳（限流时同一批429通常带相同的日期）"""
+    return parsedate_to_datetime(value).timestamp()
+
+
+# 预编码请求头的驻留表，相同内容的键值共用同一个bytes对象
+_HEADER_BYTES: Dict[str, bytes] = {}
+
+
+def _intern_header(value: str) -> bytes:
+    """编码并驻留请求头字符串"""
+    encoded = _HEADER_BYTES.get(value)
+    if encoded is None:
+        encoded = _HEADER_BYTES[value] = value.encode()
+    return encoded
+
+
+def _encode_headers(headers: Dict[str, str]) -> tuple:
+    """将请求头预编码为 (bytes, bytes) 元组，避免每个请求重复编码"""
+    return tuple((_intern_header(k), _intern_header(v)) for k, v in headers.items())
+
+
 class AntiSpiderMiddleware:
     """反爬虫中间件"""
 
+    # 常见浏览器请求头（导入时编码一次）
+    _DEFAULT_HEADERS = _encode_headers({
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+        'Cache-Control': 'max-age=0',
+    })
+
     def __init__(self, settings):
         self.ua = UserAgent()
         self.delay = settings.getfloat('DOWNLOAD_DELAY', 1.0)
         self.concurrent_requests = settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN', 8)
+        self.max_retry_times = settings.getint('RETRY_TIMES', 3)
 
-        # 域名访问记录
-        self.domain_last_access: Dict[str, float] = {}
-        self.domain_request_count: Dict[str, int] = {}
+        # 域名状态: [下一个可用的请求时间点(monotonic), 请求计数, 请求间隔]，每个请求只查一次字典
+        self.domain_state: DefaultDict[str, list] = defaultdict(lambda: [0.0, 0, self.delay])
 
         # 自定义User-Agent列表
         self.user_agents = self._load_user_agents()
 
+        # 随机字节 -> User-Agent 查找表，随机字节从os.urandom批量获取
+        self._ua_lut = [self.user_agents[i % len(self.user_agents)] for i in range(256)]
+        self._rand_pool = bytearray()
+
     @classmethod
     def from_crawler(cls, crawler):
         middleware = cls(crawler.settings)
@@ -65,35 +153,38 @@ class AntiSpiderMiddleware:
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 OPR/106.0.0.0',
         ]
 
+    def _pick_user_agent(self) -> str:
+        """随机选择User-Agent"""
+        if not self._rand_pool:
+            self._rand_pool = bytearray(os.urandom(4096))
+        return self._ua_lut[self._rand_pool.pop()]
+
     def process_request(self, request, spider):
         """处理请求 - 添加反爬虫措施"""
         # 1. 设置随机User-Agent
         if 'User-Agent' not in request.headers:
-            request.headers['User-Agent'] = random.choice(self.user_agents)
+            request.headers['User-Agent'] = self._pick_user_agent()
 
-        # 2. 添加常见浏览器请求头
-        request.headers.update({
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'Cache-Control': 'max-age=0',
-        })
+        # 2. 添加常见浏览器请求头（只补齐缺失项）
+        headers = request.headers
+        for key, value in self._DEFAULT_HEADERS:
+            if key not in headers:
+                headers[key] = value
 
         # 3. 请求频率控制
-        domain = self._get_domain(request.url)
-        self._throttle_request(domain)
+        domain = _request_netloc(request)
+        wait = self._throttle_request(domain)
 
         # 4. 添加Referer（如果不是第一个请求）
         if request.meta.get('referer'):
             request.headers['Referer'] = request.meta['referer']
 
+        if wait > 0:
+            # 非阻塞延迟：到点后以None继续后续中间件，不占用reactor
+            # reactor延迟导入，避免抢先安装默认reactor（scrapy-playwright需要asyncio reactor）
+            from twisted.internet import reactor
+            return deferLater(reactor, wait, lambda: None)
+
         return None
 
     def process_response(self, request, response, spider):
@@ -104,11 +195,24 @@ class AntiSpiderMiddleware:
             # 可以在这里触发验证码处理流程
             request.meta['captcha_detected'] = True
 
-        # 检测是否被限流
+        # 检测是否被限流：只对该域名退避，并重新排队原请求
         if response.status == 429:
             logger.warning(f"请求被限流: {response.url}")
-            # 可以增加延迟时间
-            self.delay = min(self.delay * 2, 10)  # 最多增加到10秒
+            state = self.domain_state[_request_netloc(request)]
+            retry_after = self._parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                # 在服务端给出的时间点之前不再放行该域名的请求
+                state[0] = max(state[0], time.monotonic() + retry_after)
+                # 之后的请求间隔与无Retry-After时一样最多增加到10秒，一次长等待不会变成永久间隔
+                state[2] = min(max(state[2], retry_after), 10)
+            else:
+                state[2] = min(state[2] * 2, 10)  # 最多增加到10秒
+
+            retries = request.meta.get('retry_times', 0) + 1
+            if retries <= self.max_retry_times:
+                retry_request = request.replace(dont_filter=True)
+                retry_request.meta['retry_times'] = retries
+                return retry_request
 
         # 检测是否被封禁
         if response.status == 403:
@@ -117,42 +221,52 @@ class AntiSpiderMiddleware:
 
         return response
 
-    def _get_domain(self, url: str) -> str:
-        """获取域名"""
-        parsed = urlparse(url)
-        return parsed.netloc
-
-    def _throttle_request(self, domain: str):
-        """控制请求频率"""
-        now = time.time()
+    def _parse_retry_after(self, value: Optional[bytes]) -> Optional[float]:
+        """解析Retry-After（秒数或HTTP-date），返回等待秒数"""
+        if not value:
+            return None
+        value = value.decode('latin-1').strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            retry_at = _parse_http_date(value)
+        except (TypeError, ValueError):
+            return None
+        return max(retry_at - time.time(), 0.0)
 
-        if domain in self.domain_last_access:
-            elapsed = now - self.domain_last_access[domain]
-            if elapsed < self.delay:
-                # 休眠剩余时间
-                sleep_time = self.delay - elapsed
-                time.sleep(sleep_time)
+    def _throttle_request(self, domain: str) -> float:
+        """控制请求频率，返回需要等待的秒数"""
+        now = time.monotonic()
+        state = self.domain_state[domain]
+        delay = state[2]
 
-        self.domain_last_access[domain] = time.time()
+        # 调度时即占用时间槽，连续到达的请求依次顺延
+        slot = max(now, state[0])
+        state[0] = slot + delay
 
         # 增加请求计数
-        self.domain_request_count[domain] = self.domain_request_count.get(domain, 0) + 1
+        state[1] += 1
+
+        # 如果请求次数过多，增加该域名的延迟
+        if state[1] > 100 and delay < 5.0:
+            state[2] = min(delay * 1.1, 5.0)  # 最多5秒
 
-        # 如果请求次数过多，增加延迟
-        if self.domain_request_count[domain] > 100:
-            self.delay = min(self.delay * 1.1, 5.0)  # 最多5秒
+        return slot - now
 
 
 class ProxyMiddleware:
     """代理中间件"""
 
+    # 失败代理记录上限
+    MAX_FAILED_PROXIES = 4096
+
     def __init__(self, settings):
         from .proxy import get_proxy_pool
         self.proxy_pool = get_proxy_pool()
         self.proxy_enabled = settings.getbool('PROXY_POOL_ENABLED', True)
 
-        # 失败统计
-        self.failed_proxies: Set[str] = set()
+        # 失败统计（按最近失败时间排序，超出上限时淘汰最久未失败的代理）
+        self.failed_proxies: OrderedDict = OrderedDict()
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -199,18 +313,26 @@ class ProxyMiddleware:
             self.proxy_pool.mark_failure(proxy_info)
 
             # 如果代理连续失败，从临时列表中移除
-            if proxy_info.proxy not in self.failed_proxies:
-                self.failed_proxies.add(proxy_info.proxy)
+            proxy = proxy_info.proxy
+            if proxy not in self.failed_proxies:
+                self.failed_proxies[proxy] = time.monotonic()
+                if len(self.failed_proxies) > self.MAX_FAILED_PROXIES:
+                    self.failed_proxies.popitem(last=False)
             else:
+                self.failed_proxies[proxy] = time.monotonic()
+                self.failed_proxies.move_to_end(proxy)
                 # 已经失败过，尝试换一个
-                logger.debug(f"代理连续失败，尝试更换: {proxy_info.proxy}")
+                logger.debug(f"代理连续失败，尝试更换: {proxy}")
 
 
 class CookieMiddleware:
     """Cookie管理中间件"""
 
     def __init__(self, settings):
-        self.cookie_jar: Dict[str, Dict] = {}
+        # 按Cookie所属域名（Set-Cookie的Domain属性，缺省为响应主机）存储
+        self.cookie_jar: Dict[str, Dict[str, str]] = {}
+        # 按请求主机缓存格式化后的Cookie头，jar变化时清空
+        self._cookie_header_cache: Dict[str, bytes] = {}
         self.cookie_enabled = settings.getbool('COOKIES_ENABLED', True)
 
     @classmethod
@@ -219,14 +341,27 @@ class CookieMiddleware:
 
     def process_request(self, request, spider):
         """为请求添加Cookie"""
-        if not self.cookie_enabled:
+        if not self.cookie_enabled or not self.cookie_jar:
             return None
 
-        domain = self._get_domain(request.url)
-
-        # 如果该域名有保存的Cookie，使用它
-        if domain in self.cookie_jar:
-            request.headers['Cookie'] = self._format_cookies(self.cookie_jar[domain])
+        netloc = _request_netloc(request)
+        header = self._cookie_header_cache.get(netloc)
+        if header is None:
+            # 只查询当前主机及其父域名，子域名的请求也能带上父域Cookie
+            cookies = None
+            for domain in _cookie_domains(netloc):
+                domain_cookies = self.cookie_jar.get(domain)
+                if domain_cookies:
+                    if cookies is None:
+                        cookies = dict(domain_cookies)
+                    else:
+                        cookies.update(domain_cookies)
+
+            header = self._format_cookies(cookies).encode() if cookies else b''
+            self._cookie_header_cache[netloc] = header
+
+        if header:
+            request.headers['Cookie'] = header
 
         return None
 
@@ -237,37 +372,47 @@ class CookieMiddleware:
 
         # 从响应头获取Cookie
         if 'Set-Cookie' in response.headers:
-            domain = self._get_domain(request.url)
-            cookies = self._parse_cookies(response.headers.getlist('Set-Cookie'))
-
-            if domain not in self.cookie_jar:
-                self.cookie_jar[domain] = {}
-
-            self.cookie_jar[domain].update(cookies)
+            domains = _cookie_domains(_request_netloc(request))
+            parsed = self._parse_cookies(response.headers.getlist('Set-Cookie'), domains)
+
+            for domain, cookies in parsed.items():
+                if domain not in self.cookie_jar:
+                    self.cookie_jar[domain] = {}
+                domain_cookies = self.cookie_jar[domain]
+                if not cookies.items() <= domain_cookies.items():
+                    domain_cookies.update(cookies)
+                    # 父域Cookie会影响多个主机，直接清空缓存按需重建
+                    self._cookie_header_cache.clear()
 
         return response
 
-    def _get_domain(self, url: str) -> str:
-        """获取域名"""
-        from urllib.parse import urlparse
-        parsed = urlparse(url)
-        return parsed.netloc
-
-    def _parse_cookies(self, cookie_headers: list) -> Dict[str, str]:
-        """解析Cookie"""
-        cookies = {}
+    def _parse_cookies(self, cookie_headers: list, domains: tuple) -> Dict[str, Dict[str, str]]:
+        """解析Cookie，按所属域名分组"""
+        host = domains[-1]
+        jar: Dict[str, Dict[str, str]] = {}
         for cookie in cookie_headers:
-            # 简单的Cookie解析
-            if b';' in cookie:
-                parts = cookie.split(b';')[0]
-            else:
-                parts = cookie
-
-            if b'=' in parts:
-                key, value = parts.split(b'=', 1)
-                cookies[key.decode()] = value.decode()
-
-        return cookies
+            # 只取第一段 name=value，用find定位切片，不生成中间列表
+            end = cookie.find(b';')
+            if end < 0:
+                end = len(cookie)
+            eq = cookie.find(b'=', 0, end)
+            if eq <= 0:
+                continue
+
+            # Domain属性只接受当前主机或其父域名，其他域名的Cookie丢弃
+            domain = host
+            if end < len(cookie):
+                for attr in cookie[end + 1:].split(b';'):
+                    name, _, value = attr.strip().partition(b'=')
+                    if name.lower() == b'domain':
+                        domain = value.decode().strip().lstrip('.').lower() or host
+                        break
+                if domain not in domains:
+                    continue
+
+            jar.setdefault(domain, {})[cookie[:eq].decode()] = cookie[eq + 1:end].decode()
+
+        return jar
 
     def _format_cookies(self, cookies: Dict[str, str]) -> str:
         """格式化Cookie为请求头格式"""
@@ -277,8 +422,8 @@ class CookieMiddleware:
 class HeadersMiddleware:
     """请求头增强中间件"""
 
-    # 常见的请求头组合
-    HEADER_SETS = [
+    # 常见的请求头组合（预编码为 (bytes, bytes) 元组）
+    HEADER_SETS = tuple(map(_encode_headers, [
         {  # Chrome
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
@@ -292,7 +437,7 @@ class HeadersMiddleware:
             'Accept-Language': 'zh-CN,zh;q=0.8,zh-TW;q=0.7,zh-HK;q=0.5,en-US;q=0.3,en;q=0.2',
             'DNT': '1',
         },
-    ]
+    ]))
 
     def __init__(self, settings):
         self.use_random_headers = settings.getbool('RANDOM_HEADERS', True)
@@ -305,10 +450,10 @@ class HeadersMiddleware:
         """添加增强的请求头"""
         if self.use_random_headers:
             # 随机选择一组请求头
-            extra_headers = random.choice(self.HEADER_SETS)
-            for key, value in extra_headers.items():
-                if key not in request.headers:
-                    request.headers[key] = value
+            headers = request.headers
+            for key, value in random.choice(self.HEADER_SETS):
+                if key not in headers:
+                    headers[key] = value
 
         return None
 
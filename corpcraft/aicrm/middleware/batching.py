@@ -0,0 +1,72 @@
+"""
+批量合并工具
+将时间窗口内到达的请求合并为一批处理，供验证码识别等批量接口使用
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+from loguru import logger
+
+
+class BatchCoalescer:
+    """请求合并器 - 凑满max_batch或等待window秒后，一次调用handler处理整批"""
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Awaitable[List[Any]]],
+        on_error: Callable[[Exception], Any],
+        window: float = 0.2,
+        max_batch: int = 16,
+    ):
+        """
+        Args:
+            handler: 批量处理函数，按输入顺序返回等长的结果列表
+            on_error: 批量处理出错时，为每个请求生成失败结果
+            window: 合并等待时间（秒）
+            max_batch: 单批最大数量
+        """
+        self.handler = handler
+        self.on_error = on_error
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()  # 持有进行中批次的引用，避免任务被回收
+
+    async def submit(self, item: Any) -> Any:
+        """加入待处理队列，等待所在批次的结果"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """将待处理队列作为一批提交"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """处理一批并分发结果，出错时整批返回失败，不让等待方挂起"""
+        try:
+            results = await self.handler([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"批量结果数量不匹配: {len(results)} != {len(batch)}")
+        except Exception as e:
+            logger.error(f"批量处理失败: {e}")
+            results = [self.on_error(e) for _ in batch]
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -3,18 +3,95 @@
 支持多种验证码识别方式：OCR本地识别、第三方打码平台、深度学习模型
 """
 import os
+import re
 import base64
 import io
-from typing import Optional, Dict, Any
+import asyncio
+import threading
+from bisect import bisect_right
+from typing import Optional, Dict, Any, List, Tuple
 from enum import Enum
 from loguru import logger
+from scrapy import signals
 from PIL import Image
 import pytesseract
 import cv2
 import numpy as np
-import requests
+import aiohttp
 from io import BytesIO
 
+from middleware.batching import BatchCoalescer
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_GRAY
+except ImportError:
+    TurboJPEG = None
+
+try:
+    import ahocorasick  # 可选依赖：多模式匹配自动机
+except ImportError:
+    ahocorasick = None
+
+
+# 响应内容中的验证码特征词
+CAPTCHA_KEYWORDS = (
+    'captcha', 'verify', 'recaptcha', 'hcaptcha', 'punish', 'g-recaptcha', 'data-sitekey',
+)
+
+# 只扫描响应前64KB
+CAPTCHA_SCAN_BYTES = 64 * 1024
+
+# 下载验证码图片的大小上限（2MB）
+MAX_CAPTCHA_BYTES = 2 << 20
+
+
+def _build_captcha_matcher():
+    """构建特征词匹配器：有pyahocorasick时用自动机，否则用预编译正则"""
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for keyword in CAPTCHA_KEYWORDS:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return lambda text: next(automaton.iter(text), None) is not None
+
+    pattern = re.compile('|'.join(map(re.escape, CAPTCHA_KEYWORDS)))
+    return lambda text: pattern.search(text) is not None
+
+
+_match_captcha_keywords = _build_captcha_matcher()
+
+
+# 共享HTTP会话，打码平台轮询和图片下载复用keep-alive连接
+# 会话绑定创建时的事件循环，换了事件循环（如再次asyncio.run）时重新创建
+_http_session: Optional[aiohttp.ClientSession] = None
+_http_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """获取当前事件循环的共享HTTP会话（需在事件循环内调用）"""
+    global _http_session, _http_session_loop
+    loop = asyncio.get_running_loop()
+    if _http_session is None or _http_session.closed or _http_session_loop is not loop:
+        # 旧会话属于另一个（通常已关闭的）事件循环，无法在当前循环里关闭，直接丢弃
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=75)
+        )
+        _http_session_loop = loop
+    return _http_session
+
+
+async def close_http_session():
+    """关闭共享HTTP会话"""
+    global _http_session, _http_session_loop
+    if (
+        _http_session is not None
+        and not _http_session.closed
+        and _http_session_loop is asyncio.get_running_loop()
+    ):
+        await _http_session.close()
+    _http_session = None
+    _http_session_loop = None
+
 
 class CaptchaType(Enum):
     """验证码类型"""
@@ -50,12 +127,46 @@ class CaptchaSolver:
 class TesseractSolver(CaptchaSolver):
     """Tesseract OCR识别器"""
 
-    def __init__(self, tesseract_path: Optional[str] = None):
+    # 噪声估计：灰度图与其3x3中值滤波结果的平均绝对差（灰度级）
+    # 干净的黑字白底图（含JPEG质量50的压缩伪影）约1~2.7；
+    # 高斯噪声σ≥8、2%椒盐噪点或干扰线均超过3，超过该值才去噪
+    DENOISE_NOISE_THRESHOLD = 3.0
+
+    CHAR_WHITELIST = '-c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+    # 批量识别时各验证码之间的空白分隔行高度
+    BATCH_SEPARATOR = 10
+
+    def __init__(self, tesseract_path: Optional[str] = None, use_opencl: bool = False):
         if tesseract_path:
             pytesseract.pytesseract.tesseract_cmd = tesseract_path
 
+        # 显式开启且OpenCL可用时通过UMat把预处理交给OpenCL执行（不修改进程级的OpenCL开关）
+        self.use_opencl = use_opencl and cv2.ocl.haveOpenCL() and cv2.ocl.useOpenCL()
+        if use_opencl and not self.use_opencl:
+            logger.warning("OpenCL不可用或已被关闭，验证码预处理使用CPU")
+
+        # JPEG验证码用libjpeg-turbo直接解码为灰度
+        self._turbojpeg = None
+        if TurboJPEG is not None:
+            try:
+                self._turbojpeg = TurboJPEG()
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"libturbojpeg不可用，使用OpenCV解码: {e}")
+
+        # 每个线程复用一块输出缓冲区
+        self._buf_tls = threading.local()
+
     async def solve(self, image_data: bytes, **kwargs) -> Dict[str, Any]:
-        """使用Tesseract识别验证码"""
+        """使用Tesseract识别验证码（在线程池中执行，不阻塞事件循环）"""
+        return await asyncio.to_thread(self._solve_sync, image_data)
+
+    async def solve_batch(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        """批量识别：纵向拼接成一张图，只启动一次tesseract进程"""
+        return await asyncio.to_thread(self._solve_batch_sync, images)
+
+    def _solve_sync(self, image_data: bytes) -> Dict[str, Any]:
+        """同步识别：预处理 + OCR"""
         try:
             # 预处理图像
             processed_image = self._preprocess_image(image_data)
@@ -63,7 +174,7 @@ class TesseractSolver(CaptchaSolver):
             # OCR识别
             text = pytesseract.image_to_string(
                 processed_image,
-                config='--psm 7 --oem 3 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+                config=f'--psm 7 --oem 3 {self.CHAR_WHITELIST}'
             )
 
             # 清理结果
@@ -80,31 +191,138 @@ class TesseractSolver(CaptchaSolver):
 
         except Exception as e:
             logger.error(f"Tesseract识别失败: {e}")
-            return {
-                'success': False,
-                'result': '',
-                'confidence': 0.0,
-                'solver': 'tesseract',
-                'error': str(e),
-            }
+            return self._failure(e)
+
+    def _solve_batch_sync(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        """同步批量识别，无法预处理的图片单独返回失败，其余拼接识别"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+        binaries = []
+        indexes = []
+        for i, data in enumerate(images):
+            try:
+                # 预处理结果在复用缓冲区中，需逐个拷贝
+                binaries.append(self._preprocess_image(data).copy())
+                indexes.append(i)
+            except Exception as e:
+                logger.error(f"Tesseract预处理失败: {e}")
+                results[i] = self._failure(e)
+
+        if not binaries:
+            return results
 
-    def _preprocess_image(self, image_data: bytes) -> Image.Image:
-        """预处理图像以提高识别率"""
-        # 转换为OpenCV格式
-        nparr = np.frombuffer(image_data, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        try:
+            tiled, offsets = self._tile_images(binaries)
+
+            # psm 6 按多行文本块识别，按单词所在行的纵坐标归属到各验证码
+            data = pytesseract.image_to_data(
+                tiled,
+                config=f'--psm 6 --oem 3 {self.CHAR_WHITELIST}',
+                output_type=pytesseract.Output.DICT,
+            )
+            words: List[List[Tuple[int, str]]] = [[] for _ in binaries]
+            for text, top, height, left in zip(data['text'], data['top'], data['height'], data['left']):
+                text = text.strip()
+                if text:
+                    index = max(bisect_right(offsets, top + height / 2) - 1, 0)
+                    words[index].append((left, text))
+
+            for i, tile_words in zip(indexes, words):
+                result = ''.join(text for _, text in sorted(tile_words)).replace(' ', '')
+                results[i] = {
+                    'success': bool(result),
+                    'result': result,
+                    'confidence': 0.7,
+                    'solver': 'tesseract',
+                }
 
-        # 转灰度
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            logger.info(f"Tesseract批量识别 {len(binaries)} 张: {[results[i]['result'] for i in indexes]}")
 
-        # 去噪
-        denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+        except Exception as e:
+            logger.error(f"Tesseract批量识别失败: {e}")
+            for i in indexes:
+                results[i] = self._failure(e)
+
+        return results
+
+    @staticmethod
+    def _failure(error: Exception) -> Dict[str, Any]:
+        """识别失败结果"""
+        return {
+            'success': False,
+            'result': '',
+            'confidence': 0.0,
+            'solver': 'tesseract',
+            'error': str(error),
+        }
+
+    def _tile_images(self, binaries: List[np.ndarray]) -> Tuple[np.ndarray, List[int]]:
+        """纵向拼接二值图（白色填充右侧和分隔行），返回拼接图及每张图的起始行"""
+        width = max(b.shape[1] for b in binaries)
+        sep = self.BATCH_SEPARATOR
+        height = sum(b.shape[0] for b in binaries) + sep * (len(binaries) + 1)
+
+        tiled = np.full((height, width), 255, dtype=np.uint8)
+        offsets = []
+        y = sep
+        for b in binaries:
+            h, w = b.shape
+            tiled[y:y + h, :w] = b
+            # 分隔行的一半归属到上下两张图，避免文字框略超出时被错分
+            offsets.append(y - sep // 2)
+            y += h + sep
+
+        return tiled, offsets
+
+    def _preprocess_image(self, image_data: bytes) -> np.ndarray:
+        """预处理图像以提高识别率（返回的数组为线程内复用缓冲区，下次调用前有效）"""
+        # 解码时直接输出灰度，省去cvtColor
+        gray = self._decode_gray(image_data)
+
+        if self.use_opencl:
+            return self._preprocess_umat(gray)
+
+        # 去噪（开销最大的一步，干净的图片直接跳过）
+        if self._needs_denoise(gray):
+            out = getattr(self._buf_tls, 'out', None)
+            if out is None or out.shape != gray.shape:
+                out = np.empty_like(gray)
+                self._buf_tls.out = out
+            cv2.fastNlMeansDenoising(gray, out, 10, 7, 21)
+        else:
+            out = gray
 
-        # 二值化
-        _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # 二值化（原地写回）
+        cv2.threshold(out, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, out)
 
-        # 转回PIL格式
-        return Image.fromarray(binary)
+        # pytesseract直接接受ndarray
+        return out
+
+    def _needs_denoise(self, gray: np.ndarray) -> bool:
+        """估计噪声水平，判断是否需要去噪（中值残差只对噪点/细线敏感，不受文字对比度影响）"""
+        return cv2.absdiff(gray, cv2.medianBlur(gray, 3)).mean() > self.DENOISE_NOISE_THRESHOLD
+
+    def _decode_gray(self, image_data: bytes) -> np.ndarray:
+        """解码为灰度图：JPEG优先用libjpeg-turbo，其他格式用OpenCV"""
+        if self._turbojpeg is not None and image_data[:3] == b'\xff\xd8\xff':
+            return self._turbojpeg.decode(image_data, pixel_format=TJPF_GRAY)[:, :, 0]
+
+        nparr = np.frombuffer(image_data, np.uint8)
+        gray = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError("无法解码验证码图片")
+        return gray
+
+    def _preprocess_umat(self, gray: np.ndarray) -> np.ndarray:
+        """OpenCL路径：去噪、二值化在设备上执行，最后取回结果"""
+        # 是否去噪在上传前用主机端数组判断
+        needs_denoise = self._needs_denoise(gray)
+        gray = cv2.UMat(gray)
+
+        if needs_denoise:
+            gray = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary.get()
 
 
 class TwoCaptchaSolver(CaptchaSolver):
@@ -161,8 +379,6 @@ class TwoCaptchaSolver(CaptchaSolver):
 
     async def _upload_captcha(self, image_data: bytes) -> Optional[str]:
         """上传验证码到2Captcha"""
-        import time
-
         # 转换为base64
         img_base64 = base64.b64encode(image_data).decode()
 
@@ -175,8 +391,10 @@ class TwoCaptchaSolver(CaptchaSolver):
             'json': 1,
         }
 
-        response = requests.post(upload_url, data=params, timeout=30)
-        result = response.json()
+        async with get_http_session().post(
+            upload_url, data=params, timeout=aiohttp.ClientTimeout(total=30)
+        ) as response:
+            result = await response.json(content_type=None)
 
         if result['status'] == 1:
             return result['request']
@@ -187,12 +405,15 @@ class TwoCaptchaSolver(CaptchaSolver):
     async def _get_result(self, captcha_id: str, max_attempts: int = 30) -> Optional[str]:
         """获取识别结果"""
         import asyncio
-        import time
 
         get_url = f"{self.base_url}/res.php"
 
+        # 2Captcha结果至少5秒后才就绪，首次轮询前先等5秒，之后指数退避（1秒起，最多5秒）
+        delay = 5.0
+        next_delay = 1.0
+
         for _ in range(max_attempts):
-            await asyncio.sleep(3)  # 等待3秒
+            await asyncio.sleep(delay)
 
             params = {
                 'key': self.api_key,
@@ -201,12 +422,16 @@ class TwoCaptchaSolver(CaptchaSolver):
                 'json': 1,
             }
 
-            response = requests.get(get_url, params=params, timeout=10)
-            result = response.json()
+            async with get_http_session().get(
+                get_url, params=params, timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                result = await response.json(content_type=None)
 
             if result['status'] == 1:
                 return result['request']
             elif result['request'] == 'CAPCHA_NOT_READY':
+                delay = next_delay
+                next_delay = min(next_delay * 1.5, 5.0)
                 continue
             else:
                 logger.error(f"获取结果失败: {result.get('request', 'Unknown error')}")
@@ -215,6 +440,35 @@ class TwoCaptchaSolver(CaptchaSolver):
         return None
 
 
+class BatchSolver(CaptchaSolver):
+    """批量识别器 - 合并时间窗口内到达的验证码，一次调用solve_batch"""
+
+    def __init__(self, solver: TesseractSolver, window: float = 0.2, max_batch: int = 16):
+        self.solver = solver
+        self._coalescer = BatchCoalescer(self._solve_batch, self._failure, window, max_batch)
+
+    async def solve(self, image_data: bytes, **kwargs) -> Dict[str, Any]:
+        """加入待识别队列，等待所在批次的识别结果"""
+        return await self._coalescer.submit(image_data)
+
+    async def _solve_batch(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        """批量识别，单张时直接识别"""
+        if len(images) == 1:
+            return [await self.solver.solve(images[0])]
+        return await self.solver.solve_batch(images)
+
+    @staticmethod
+    def _failure(error: Exception) -> Dict[str, Any]:
+        """批量识别失败结果"""
+        return {
+            'success': False,
+            'result': '',
+            'confidence': 0.0,
+            'solver': 'batch',
+            'error': str(error),
+        }
+
+
 class HybridSolver(CaptchaSolver):
     """混合识别器 - 优先使用本地OCR，失败时使用第三方平台"""
 
@@ -222,8 +476,11 @@ class HybridSolver(CaptchaSolver):
         self,
         tesseract_path: Optional[str] = None,
         two_captcha_api_key: Optional[str] = None,
+        batch_window: float = 0,
     ):
         self.tesseract_solver = TesseractSolver(tesseract_path)
+        if batch_window > 0:
+            self.tesseract_solver = BatchSolver(self.tesseract_solver, batch_window)
         self.two_captcha_solver = TwoCaptchaSolver(two_captcha_api_key) if two_captcha_api_key else None
 
     async def solve(self, image_data: bytes, **kwargs) -> Dict[str, Any]:
@@ -255,14 +512,20 @@ class CaptchaHandler:
         self.config = config
 
         # 根据类型创建识别器
+        # batch_window > 0 时合并窗口期内的本地OCR请求
+        batch_window = config.get('batch_window') or 0
+
         if solver_type == "tesseract":
             self.solver = TesseractSolver(config.get('tesseract_path'))
+            if batch_window > 0:
+                self.solver = BatchSolver(self.solver, batch_window)
         elif solver_type == "2captcha":
             self.solver = TwoCaptchaSolver(config['api_key'])
         elif solver_type == "hybrid":
             self.solver = HybridSolver(
                 tesseract_path=config.get('tesseract_path'),
                 two_captcha_api_key=config.get('api_key'),
+                batch_window=batch_window,
             )
         else:
             raise ValueError(f"不支持的识别器类型: {solver_type}")
@@ -307,8 +570,19 @@ class CaptchaHandler:
         """加载验证码图片"""
         # 如果是URL
         if isinstance(source, str) and source.startswith(('http://', 'https://')):
-            response = requests.get(source, timeout=10)
-            return response.content
+            async with get_http_session().get(
+                source, timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                # 分块读取并限制大小，避免异常响应占满内存
+                if (response.content_length or 0) > MAX_CAPTCHA_BYTES:
+                    raise ValueError(f"验证码图片过大: {response.content_length} bytes")
+
+                buf = bytearray()
+                async for chunk in response.content.iter_chunked(16384):
+                    buf += chunk
+                    if len(buf) > MAX_CAPTCHA_BYTES:
+                        raise ValueError(f"验证码图片超过{MAX_CAPTCHA_BYTES} bytes")
+                return bytes(buf)
 
         # 如果是文件路径
         elif isinstance(source, str) and os.path.exists(source):
@@ -365,6 +639,7 @@ class CaptchaMiddleware:
         config = {
             'tesseract_path': settings.get('TESSERACT_PATH'),
             'api_key': settings.get('TWO_CAPTCHA_API_KEY'),
+            'batch_window': settings.getfloat('CAPTCHA_BATCH_WINDOW', 0.2),
         }
 
         self.handler = CaptchaHandler(solver_type, **config)
@@ -372,7 +647,15 @@ class CaptchaMiddleware:
 
     @classmethod
     def from_crawler(cls, crawler):
-        return cls(crawler.settings)
+        middleware = cls(crawler.settings)
+        crawler.signals.connect(
+            middleware.spider_closed, signal=signals.spider_closed
+        )
+        return middleware
+
+    async def spider_closed(self, spider):
+        """爬虫关闭时释放HTTP连接"""
+        await close_http_session()
 
     async def process_response(self, request, response, spider):
         """处理响应中的验证码"""
@@ -408,7 +691,11 @@ class CaptchaMiddleware:
         if 'image' in content_type:
             return True
 
-        # 可以添加更多检测逻辑
+        # 单次扫描响应正文前64KB，匹配所有特征词
+        body = response.body[:CAPTCHA_SCAN_BYTES]
+        if body and _match_captcha_keywords(body.decode('latin-1').lower()):
+            return True
+
         return False
 
     def _extract_captcha_image(self, response) -> Optional[bytes]:
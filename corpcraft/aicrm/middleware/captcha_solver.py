@@ -7,10 +7,14 @@ import io
 import base64
 import random
 import string
+import time
 import asyncio
+import threading
+import hashlib
+from collections import OrderedDict
 from typing import Optional, Dict, Any, List, Tuple
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from loguru import logger
 from PIL import Image, ImageDraw, ImageFont
 import cv2
@@ -18,6 +22,13 @@ import numpy as np
 import requests
 from io import BytesIO
 
+from middleware.batching import BatchCoalescer
+
+try:
+    import aiohttp  # 可选依赖：异步下载图片、2Captcha接口
+except ImportError:
+    aiohttp = None
+
 
 class CaptchaType(Enum):
     """验证码类型"""
@@ -43,6 +54,21 @@ class CaptchaResult:
     duration: float = 0.0  # 识别耗时（秒）
 
 
+# 下载验证码图片的大小上限（2MB）
+MAX_CAPTCHA_BYTES = 2 << 20
+
+# CLAHE对象内部带缓冲区，不能跨线程共用，每个线程各建一个
+_clahe_local = threading.local()
+
+
+def _get_clahe():
+    """获取当前线程的CLAHE实例"""
+    clahe = getattr(_clahe_local, 'clahe', None)
+    if clahe is None:
+        clahe = _clahe_local.clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+    return clahe
+
+
 class ImagePreprocessor:
     """图像预处理器"""
 
@@ -51,6 +77,16 @@ class ImagePreprocessor:
         """去噪"""
         return cv2.fastNlMeansDenoisingColored(image, None, 10, 10, 7, 21)
 
+    @staticmethod
+    def denoise_fast(image: np.ndarray, method: str = 'bilateral') -> np.ndarray:
+        """快速去噪（单通道）：双边滤波保留文字边缘，或高斯模糊"""
+        if method == 'bilateral':
+            return cv2.bilateralFilter(image, 5, 50, 50)
+        elif method == 'gaussian':
+            return cv2.GaussianBlur(image, (3, 3), 0)
+        else:
+            return cv2.fastNlMeansDenoising(image, None, 10, 7, 21)
+
     @staticmethod
     def to_gray(image: np.ndarray) -> np.ndarray:
         """转灰度图"""
@@ -75,18 +111,15 @@ class ImagePreprocessor:
     @staticmethod
     def remove_lines(image: np.ndarray) -> np.ndarray:
         """移除干扰线"""
-        # 使用形态学操作移除细线
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        opened = cv2.morphologyEx(image, cv2.MORPH_OPEN, kernel)
-        return opened
+        # 3x3中值滤波一遍即可去掉1像素宽的细线，比开运算（腐蚀+膨胀两遍）更省
+        return cv2.medianBlur(image, 3)
 
     @staticmethod
     def enhance_contrast(image: np.ndarray) -> np.ndarray:
         """增强对比度"""
         lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
         l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        cl = clahe.apply(l)
+        cl = _get_clahe().apply(l)
         enhanced = cv2.merge([cl, a, b])
         return cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
 
@@ -98,33 +131,106 @@ class ImagePreprocessor:
         return cv2.resize(image, new_size, interpolation=cv2.INTER_CUBIC)
 
     @staticmethod
-    def preprocess_for_ocr(image: np.ndarray) -> np.ndarray:
-        """OCR预处理流程"""
-        # 1. 转灰度
-        gray = ImagePreprocessor.to_gray(image)
+    def preprocess_for_ocr(image: np.ndarray, denoise_quality: bool = False) -> np.ndarray:
+        """
+        OCR预处理流程（全程单通道，不在灰度/BGR/LAB之间来回转换）
 
-        # 2. 增强对比度
-        enhanced = ImagePreprocessor.enhance_contrast(cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+        Args:
+            image: 输入图像（BGR或灰度）
+            denoise_quality: 使用非局部均值去噪（效果更好但慢一个数量级以上），默认双边滤波
+        """
+        # 1. 取亮度通道：彩色图转LAB取L，灰度图直接使用
+        if len(image.shape) == 3:
+            lightness = cv2.extractChannel(cv2.cvtColor(image, cv2.COLOR_BGR2LAB), 0)
+        else:
+            lightness = image
 
-        # 3. 去噪
-        denoised = ImagePreprocessor.denoise(enhanced)
+        # 2. 增强对比度（CLAHE作用于L通道）
+        enhanced = _get_clahe().apply(lightness)
 
-        # 4. 转回灰度
-        gray = ImagePreprocessor.to_gray(denoised)
+        # 3. 去噪（单通道版本）
+        denoised = ImagePreprocessor.denoise_fast(enhanced, 'nlmeans' if denoise_quality else 'bilateral')
 
-        # 5. 二值化
-        binary = ImagePreprocessor.binarize(gray, method='otsu')
+        # 4. 二值化
+        binary = ImagePreprocessor.binarize(denoised, method='otsu')
 
-        # 6. 放大
+        # 5. 放大
         resized = ImagePreprocessor.resize(binary, scale=2.0)
 
         return resized
 
 
+class GPUImagePreprocessor:
+    """
+    CUDA预处理器：颜色转换、CLAHE、去噪在GPU上完成，只下载一次
+    需要带CUDA模块编译的OpenCV，pip版opencv-python不含CUDA
+    """
+
+    def __init__(self):
+        # GPU版CLAHE同样带内部缓冲区，每个线程各建一个
+        self._local = threading.local()
+
+    @staticmethod
+    def is_available() -> bool:
+        """当前OpenCV构建是否可用CUDA设备"""
+        try:
+            return cv2.cuda.getCudaEnabledDeviceCount() > 0
+        except (AttributeError, cv2.error):
+            return False
+
+    def _get_clahe(self):
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = self._local.clahe = cv2.cuda.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+        return clahe
+
+    def preprocess_for_ocr(self, image: np.ndarray, denoise_quality: bool = False) -> np.ndarray:
+        """与ImagePreprocessor.preprocess_for_ocr输出一致"""
+        gpu_image = cv2.cuda_GpuMat()
+        gpu_image.upload(image)
+
+        # 1. 取亮度通道
+        if len(image.shape) == 3:
+            lightness = cv2.cuda.split(cv2.cuda.cvtColor(gpu_image, cv2.COLOR_BGR2LAB))[0]
+        else:
+            lightness = gpu_image
+
+        # 2. 增强对比度
+        enhanced = self._get_clahe().apply(lightness, cv2.cuda_Stream.Null())
+
+        # 3. 去噪
+        if denoise_quality:
+            denoised = cv2.cuda.fastNlMeansDenoising(enhanced, 10, search_window=21, block_size=7)
+        else:
+            denoised = cv2.cuda.bilateralFilter(enhanced, 5, 50, 50)
+
+        # 4/5. CUDA阈值不支持Otsu，下载后在CPU上二值化、放大（单通道小图，开销很小）
+        binary = ImagePreprocessor.binarize(denoised.download(), method='otsu')
+        return ImagePreprocessor.resize(binary, scale=2.0)
+
+
 class TesseractSolver:
     """Tesseract OCR识别器"""
 
-    def __init__(self, tesseract_path: Optional[str] = None, lang: str = 'eng'):
+    def __init__(
+        self,
+        tesseract_path: Optional[str] = None,
+        lang: str = 'eng',
+        concurrency: Optional[int] = None,
+        use_gpu_preprocess: bool = False
+    ):
+        # 同时运行的tesseract进程数上限
+        self.concurrency = concurrency or os.cpu_count() or 4
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # 预处理：开启且有CUDA设备时走GPU，否则CPU
+        self.preprocess = ImagePreprocessor.preprocess_for_ocr
+        if use_gpu_preprocess:
+            if GPUImagePreprocessor.is_available():
+                self.preprocess = GPUImagePreprocessor().preprocess_for_ocr
+            else:
+                logger.warning("未检测到CUDA设备，验证码预处理使用CPU")
+
         try:
             import pytesseract
             self.pytesseract = pytesseract
@@ -145,7 +251,7 @@ class TesseractSolver:
         whitelist: Optional[str] = None,
         length: Optional[int] = None
     ) -> CaptchaResult:
-        """识别文本验证码"""
+        """识别文本验证码（预处理和OCR在线程池中执行，并发数受信号量限制）"""
         if not self.available:
             return CaptchaResult(
                 success=False,
@@ -155,11 +261,24 @@ class TesseractSolver:
                 error="Tesseract未安装"
             )
 
-        start_time = asyncio.get_event_loop().time()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._semaphore:
+            return await asyncio.to_thread(self._solve_sync, image, whitelist, length)
+
+    def _solve_sync(
+        self,
+        image: np.ndarray,
+        whitelist: Optional[str] = None,
+        length: Optional[int] = None
+    ) -> CaptchaResult:
+        """同步识别：预处理 + OCR"""
+        start_time = time.perf_counter()
 
         try:
             # 预处理图像
-            preprocessed = ImagePreprocessor.preprocess_for_ocr(image)
+            preprocessed = self.preprocess(image)
 
             # 构建配置
             config = '--psm 7 --oem 3'  # 7=单行文本, 3=默认OCR引擎
@@ -167,8 +286,10 @@ class TesseractSolver:
             if whitelist:
                 config += f' -c tessedit_char_whitelist={whitelist}'
 
-            # OCR识别
-            pil_image = Image.fromarray(preprocessed)
+            # OCR识别：pytesseract按图片的format写临时文件，未设置时是PNG（要deflate压缩）
+            # 先编码为BMP再打开，临时文件直接写BMP，省掉压缩/解压
+            _, buffer = cv2.imencode('.bmp', preprocessed)
+            pil_image = Image.open(BytesIO(buffer))
             text = self.pytesseract.image_to_string(pil_image, lang=self.lang, config=config)
 
             # 清理结果
@@ -179,7 +300,7 @@ class TesseractSolver:
                 # 尝试提取最可能的部分
                 result = result[:length]
 
-            duration = asyncio.get_event_loop().time() - start_time
+            duration = time.perf_counter() - start_time
 
             logger.info(f"Tesseract识别: {result} (耗时: {duration:.2f}s)")
 
@@ -214,6 +335,14 @@ class DDDDOCRSolver:
             logger.warning("DDDDOCR未安装，pip install ddddocr")
             self.available = False
             self.ocr = None
+            return
+
+        # 预热：首次推理会触发onnxruntime的初始化开销
+        try:
+            _, buffer = cv2.imencode('.bmp', np.full((64, 160, 3), 255, dtype=np.uint8))
+            self.ocr.classification(buffer.tobytes())
+        except Exception as e:
+            logger.warning(f"DDDDOCR预热失败: {e}")
 
     async def solve(self, image: np.ndarray) -> CaptchaResult:
         """使用DDDDOCR识别验证码"""
@@ -229,8 +358,8 @@ class DDDDOCRSolver:
         start_time = asyncio.get_event_loop().time()
 
         try:
-            # 将OpenCV图像转换为bytes
-            _, buffer = cv2.imencode('.png', image)
+            # 将OpenCV图像转换为bytes（BMP不压缩，编解码几乎无开销）
+            _, buffer = cv2.imencode('.bmp', image)
             image_bytes = buffer.tobytes()
 
             # 识别
@@ -258,18 +387,62 @@ class DDDDOCRSolver:
                 error=str(e)
             )
 
+    async def solve_batch(self, images: List[np.ndarray]) -> List[CaptchaResult]:
+        """批量识别：整批在一个工作线程中连续推理，不阻塞事件循环"""
+        if not self.available:
+            return [await self.solve(image) for image in images]
+
+        return await asyncio.to_thread(self._classify_batch, images)
+
+    def _classify_batch(self, images: List[np.ndarray]) -> List[CaptchaResult]:
+        """同步批量推理"""
+        results = []
+        for image in images:
+            start_time = time.perf_counter()
+            try:
+                _, buffer = cv2.imencode('.bmp', image)
+                result = self.ocr.classification(buffer.tobytes())
+                results.append(CaptchaResult(
+                    success=bool(result),
+                    result=result,
+                    confidence=0.9,
+                    solver="ddddocr",
+                    duration=time.perf_counter() - start_time
+                ))
+            except Exception as e:
+                logger.error(f"DDDDOCR识别失败: {e}")
+                results.append(CaptchaResult(
+                    success=False,
+                    result=None,
+                    confidence=0.0,
+                    solver="ddddocr",
+                    error=str(e)
+                ))
+
+        logger.info(f"DDDDOCR批量识别 {len(images)} 张: {[r.result for r in results]}")
+        return results
+
 
 class EasyCaptchaSolver:
     """EasyCaptcha深度学习识别器"""
 
     def __init__(self):
-        try:
-            from_easy_captcha = __import__('from easy_captcha import Captcha')
-            self.Captcha = from_easy_captcha.Captcha
-            self.available = True
-        except ImportError:
-            logger.warning("EasyCaptcha未安装")
-            self.available = False
+        # 延迟到第一次使用时再导入，避免爬虫启动时加载模型依赖
+        self.Captcha = None
+        self._imported = False
+        self._available = False
+
+    @property
+    def available(self) -> bool:
+        if not self._imported:
+            self._imported = True
+            try:
+                from easy_captcha import Captcha
+                self.Captcha = Captcha
+                self._available = True
+            except ImportError:
+                logger.warning("EasyCaptcha未安装")
+        return self._available
 
     async def solve(self, image: np.ndarray) -> CaptchaResult:
         """使用EasyCaptcha识别"""
@@ -314,6 +487,11 @@ class TwoCaptchaSolver:
         self.api_key = api_key
         self.base_url = "http://2captcha.com"
         self.available = bool(api_key)
+        self._session = None
+
+        if self.available and aiohttp is None:
+            logger.warning("aiohttp未安装，2Captcha功能不可用")
+            self.available = False
 
     async def solve(self, image: np.ndarray) -> CaptchaResult:
         """使用2Captcha平台识别"""
@@ -387,44 +565,57 @@ class TwoCaptchaSolver:
             'json': 1,
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(upload_url, data=params, timeout=30) as response:
-                result = await response.json()
+        async with self._get_session().post(upload_url, data=params, timeout=30) as response:
+            result = await response.json()
 
-                if result.get('status') == 1:
-                    return result.get('request')
-                else:
-                    logger.error(f"上传失败: {result.get('request')}")
-                    return None
+            if result.get('status') == 1:
+                return result.get('request')
+            else:
+                logger.error(f"上传失败: {result.get('request')}")
+                return None
 
     async def _poll_result(self, captcha_id: str, max_attempts: int = 30) -> Optional[str]:
         """轮询获取识别结果"""
         get_url = f"{self.base_url}/res.php"
+        params = {
+            'key': self.api_key,
+            'action': 'get',
+            'id': captcha_id,
+            'json': 1,
+        }
+
+        # 指数退避：2秒起，每次翻倍，最多8秒
+        delay = 2.0
 
         for i in range(max_attempts):
-            await asyncio.sleep(3)  # 每3秒查询一次
-
-            params = {
-                'key': self.api_key,
-                'action': 'get',
-                'id': captcha_id,
-                'json': 1,
-            }
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(get_url, params=params, timeout=10) as response:
-                    result = await response.json()
-
-                    if result.get('status') == 1:
-                        return result.get('request')
-                    elif result.get('request') == 'CAPCHA_NOT_READY':
-                        continue
-                    else:
-                        logger.error(f"获取结果失败: {result.get('request')}")
-                        return None
+            await asyncio.sleep(delay)
+
+            async with self._get_session().get(get_url, params=params, timeout=10) as response:
+                result = await response.json()
+
+                if result.get('status') == 1:
+                    return result.get('request')
+                elif result.get('request') == 'CAPCHA_NOT_READY':
+                    delay = min(delay * 2, 8.0)
+                    continue
+                else:
+                    logger.error(f"获取结果失败: {result.get('request')}")
+                    return None
 
         return None
 
+    def _get_session(self):
+        """获取复用的HTTP会话，上传和轮询共用连接"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def close(self):
+        """关闭HTTP会话"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
 
 class HybridCaptchaSolver:
     """混合验证码识别器 - 组合多种识别器"""
@@ -437,7 +628,11 @@ class HybridCaptchaSolver:
         # 1. Tesseract OCR
         tesseract_path = self.config.get('tesseract_path')
         if tesseract_path or True:  # 尝试使用系统默认
-            self.solvers.append(TesseractSolver(tesseract_path))
+            self.solvers.append(TesseractSolver(
+                tesseract_path,
+                concurrency=self.config.get('ocr_concurrency'),
+                use_gpu_preprocess=self.config.get('use_gpu_preprocess', False)
+            ))
 
         # 2. DDDDOCR
         self.solvers.append(DDDDOCRSolver())
@@ -450,6 +645,35 @@ class HybridCaptchaSolver:
         if api_key:
             self.solvers.append(TwoCaptchaSolver(api_key))
 
+        # 文本验证码的识别器优先级，首次识别时构建
+        self._text_priority: Optional[List[Tuple[Any, bool, bool]]] = None
+
+    def _text_solvers(self) -> List[Tuple[Any, bool, bool]]:
+        """
+        文本验证码识别器（按优先级排好、只含可用的），元素为 (识别器, 是否透传识别参数, 是否第三方)
+        首次调用时才检查可用性，不提前触发EasyCaptcha的延迟导入
+        """
+        if self._text_priority is None:
+            # 优先深度学习识别器，其次Tesseract，最后第三方API
+            tiers = (
+                ((DDDDOCRSolver, EasyCaptchaSolver), False, False),
+                (TesseractSolver, True, False),
+                (TwoCaptchaSolver, False, True),
+            )
+            self._text_priority = [
+                (solver, pass_kwargs, remote)
+                for solver_types, pass_kwargs, remote in tiers
+                for solver in self.solvers
+                if isinstance(solver, solver_types) and solver.available
+            ]
+        return self._text_priority
+
+    async def close(self):
+        """关闭各识别器持有的HTTP会话"""
+        for solver in self.solvers:
+            if isinstance(solver, TwoCaptchaSolver):
+                await solver.close()
+
     async def solve(
         self,
         image: np.ndarray,
@@ -461,27 +685,15 @@ class HybridCaptchaSolver:
 
         # 对于文本验证码，按优先级尝试各个识别器
         if captcha_type == CaptchaType.TEXT_IMAGE:
-            # 优先使用深度学习识别器
-            for solver in self.solvers:
-                if isinstance(solver, DDDDOCRSolver) or isinstance(solver, EasyCaptchaSolver):
-                    if solver.available:
-                        result = await solver.solve(image)
-                        if result.success:
-                            return result
-
-            # 降级到Tesseract
-            for solver in self.solvers:
-                if isinstance(solver, TesseractSolver) and solver.available:
-                    result = await solver.solve(image, **kwargs)
-                    if result.success:
-                        return result
-
-            # 最后使用第三方API
-            for solver in self.solvers:
-                if isinstance(solver, TwoCaptchaSolver) and solver.available:
+            for solver, pass_kwargs, remote in self._text_solvers():
+                if remote:
                     logger.info("本地识别失败，使用第三方打码平台...")
                     return await solver.solve(image)
 
+                result = await (solver.solve(image, **kwargs) if pass_kwargs else solver.solve(image))
+                if result.success:
+                    return result
+
         # 其他类型的验证码（简化处理）
         return CaptchaResult(
             success=False,
@@ -491,18 +703,126 @@ class HybridCaptchaSolver:
             error=f"不支持的验证码类型: {captcha_type.value}"
         )
 
+    async def solve_batch(
+        self,
+        images: List[np.ndarray],
+        captcha_type: CaptchaType = CaptchaType.TEXT_IMAGE,
+        **kwargs
+    ) -> List[CaptchaResult]:
+        """批量识别：按识别器优先级逐级处理，每一级只处理上一级未识别成功的图片"""
+        if captcha_type != CaptchaType.TEXT_IMAGE:
+            return [await self.solve(image, captcha_type, **kwargs) for image in images]
+
+        results: List[Optional[CaptchaResult]] = [None] * len(images)
+        pending = list(range(len(images)))
+
+        async def run(solver, solve_kwargs):
+            nonlocal pending
+            batch = [images[i] for i in pending]
+            if hasattr(solver, 'solve_batch'):
+                batch_results = await solver.solve_batch(batch)
+            else:
+                batch_results = await asyncio.gather(*(solver.solve(image, **solve_kwargs) for image in batch))
+
+            still_pending = []
+            for i, result in zip(pending, batch_results):
+                results[i] = result
+                if not result.success:
+                    still_pending.append(i)
+            pending = still_pending
+
+        for solver, pass_kwargs, remote in self._text_solvers():
+            if not pending:
+                break
+            if remote:
+                logger.info(f"本地识别失败 {len(pending)} 张，使用第三方打码平台...")
+            await run(solver, kwargs if pass_kwargs else {})
+
+        return [
+            result if result is not None else CaptchaResult(
+                success=False,
+                result=None,
+                confidence=0.0,
+                solver="hybrid",
+                error="没有可用的识别器"
+            )
+            for result in results
+        ]
+
 
 class CaptchaSolver:
     """验证码识别器主类"""
 
+    # 识别结果缓存：站点常从固定的验证码池里出图，同一张图（像素完全一致）直接复用结果
+    RESULT_CACHE_SIZE = 4096
+    RESULT_CACHE_MIN_CONFIDENCE = 0.8
+
+    # 最近识别结果的统计窗口：环形缓冲，各字段分开存成数组，统计时直接向量化计算
+    STATS_WINDOW = 1024
+
     def __init__(self, config: Dict[str, Any] = None):
         self.config = config or {}
         self.hybrid_solver = HybridCaptchaSolver(config)
+        self._result_cache: OrderedDict[Tuple, CaptchaResult] = OrderedDict()
+
+        # 下载验证码图片的HTTP会话（首次使用时创建）
+        self._session = None
 
         # 统计信息
         self.total_solved = 0
         self.total_failed = 0
-        self.success_rate = 0.0
+        self._recent_success = np.zeros(self.STATS_WINDOW, dtype=bool)
+        self._recent_confidence = np.zeros(self.STATS_WINDOW, dtype=np.float32)
+        self._recent_duration = np.zeros(self.STATS_WINDOW, dtype=np.float32)
+        self._recent_count = 0  # 累计写入条数，写入位置为 _recent_count % STATS_WINDOW
+
+    @property
+    def success_rate(self) -> float:
+        """成功率"""
+        total = self.total_solved + self.total_failed
+        if total == 0:
+            return 0.0
+        return self.total_solved / total
+
+    def _record(self, results: List[CaptchaResult]):
+        """更新累计计数，并把结果写入最近窗口"""
+        solved = sum(1 for result in results if result.success)
+        self.total_solved += solved
+        self.total_failed += len(results) - solved
+
+        recent = results[-self.STATS_WINDOW:]
+        start = self._recent_count + len(results) - len(recent)
+        index = (start + np.arange(len(recent))) % self.STATS_WINDOW
+        self._recent_success[index] = [result.success for result in recent]
+        self._recent_confidence[index] = [result.confidence for result in recent]
+        self._recent_duration[index] = [result.duration for result in recent]
+        self._recent_count += len(results)
+
+    @staticmethod
+    def _cache_key(image: np.ndarray, captcha_type: CaptchaType, kwargs: Dict[str, Any]) -> Tuple:
+        """
+        按图像内容计算缓存键
+        用精确的内容摘要而不是感知哈希：感知哈希会忽略字符笔画这类细节，不同验证码可能撞到同一个键
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str((image.shape, image.dtype.str)).encode())
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.digest(), captcha_type, tuple(sorted(kwargs.items()))
+
+    def _get_cached(self, key: Tuple) -> Optional[CaptchaResult]:
+        result = self._result_cache.get(key)
+        if result is not None:
+            self._result_cache.move_to_end(key)
+            result = replace(result, duration=0.0)
+        return result
+
+    def _store_cached(self, key: Tuple, result: CaptchaResult):
+        # 只缓存成功且置信度足够的结果，识别错的答案不能反复使用
+        if not result.success or result.confidence < self.RESULT_CACHE_MIN_CONFIDENCE:
+            return
+        self._result_cache[key] = result
+        if len(self._result_cache) > self.RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
 
     async def solve(
         self,
@@ -534,31 +854,72 @@ class CaptchaSolver:
                     error="无法加载图像"
                 )
 
+            key = self._cache_key(image, captcha_type, kwargs)
+            result = self._get_cached(key)
+            if result is not None:
+                self._record([result])
+                return result
+
             # 调用识别器
             result = await self.hybrid_solver.solve(image, captcha_type, **kwargs)
-
-            # 更新统计
-            if result.success:
-                self.total_solved += 1
-            else:
-                self.total_failed += 1
-
-            total = self.total_solved + self.total_failed
-            if total > 0:
-                self.success_rate = self.total_solved / total
-
+            self._store_cached(key, result)
+            self._record([result])
             return result
 
         except Exception as e:
             logger.error(f"验证码识别异常: {e}")
-            self.total_failed += 1
-            return CaptchaResult(
+            result = CaptchaResult(
                 success=False,
                 result=None,
                 confidence=0.0,
                 solver="main",
                 error=str(e)
             )
+            self._record([result])
+            return result
+
+    async def solve_batch(
+        self,
+        image_sources: List[Any],
+        captcha_type: CaptchaType = CaptchaType.TEXT_IMAGE,
+        **kwargs
+    ) -> List[CaptchaResult]:
+        """批量识别验证码"""
+        images = [await self._load_image(source) for source in image_sources]
+        valid = [i for i, image in enumerate(images) if image is not None]
+
+        results = [
+            CaptchaResult(success=False, result=None, confidence=0.0, solver="main", error="无法加载图像")
+            for _ in images
+        ]
+
+        # 命中缓存的直接取结果，其余的送去识别
+        keys = {i: self._cache_key(images[i], captcha_type, kwargs) for i in valid}
+        misses = []
+        for i in valid:
+            cached = self._get_cached(keys[i])
+            if cached is not None:
+                results[i] = cached
+            else:
+                misses.append(i)
+
+        try:
+            if misses:
+                batch_results = await self.hybrid_solver.solve_batch(
+                    [images[i] for i in misses], captcha_type, **kwargs
+                )
+                for i, result in zip(misses, batch_results):
+                    results[i] = result
+                    self._store_cached(keys[i], result)
+        except Exception as e:
+            logger.error(f"批量验证码识别异常: {e}")
+            for i in misses:
+                results[i] = CaptchaResult(
+                    success=False, result=None, confidence=0.0, solver="main", error=str(e)
+                )
+
+        self._record(results)
+        return results
 
     async def _load_image(self, source: Any) -> Optional[np.ndarray]:
         """加载图像"""
@@ -574,8 +935,15 @@ class CaptchaSolver:
         # 如果是URL
         elif isinstance(source, str) and source.startswith(('http://', 'https://')):
             try:
-                response = requests.get(source, timeout=10)
-                nparr = np.frombuffer(response.content, np.uint8)
+                if aiohttp is not None:
+                    session = self._ensure_session()
+                    async with session.get(source, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                        data = await self._read_body(response)
+                else:
+                    response = await asyncio.to_thread(requests.get, source, timeout=10)
+                    data = response.content
+
+                nparr = np.frombuffer(data, np.uint8)
                 image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
                 return image
             except Exception as e:
@@ -597,12 +965,51 @@ class CaptchaSolver:
             logger.error(f"不支持的图像源类型: {type(source)}")
             return None
 
+    @staticmethod
+    async def _read_body(response) -> memoryview:
+        """分块读取响应体：按Content-Length预分配缓冲区，边下载边写入，并限制大小"""
+        expected = response.content_length or 0
+        if expected > MAX_CAPTCHA_BYTES:
+            raise ValueError(f"验证码图片过大: {expected} bytes")
+
+        buf = bytearray(expected)
+        size = 0
+        async for chunk in response.content.iter_chunked(65536):
+            end = size + len(chunk)
+            if end > MAX_CAPTCHA_BYTES:
+                raise ValueError(f"验证码图片超过{MAX_CAPTCHA_BYTES} bytes")
+            # 超出预分配长度（没有Content-Length或经过解压）时切片赋值会自动扩展
+            buf[size:end] = chunk
+            size = end
+
+        # 直接交给np.frombuffer，不再复制成bytes
+        return memoryview(buf)[:size]
+
+    def _ensure_session(self):
+        """获取复用的HTTP会话"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def aclose(self):
+        """关闭HTTP会话（包括各识别器自己的会话）"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        await self.hybrid_solver.close()
+
     def get_stats(self) -> Dict[str, Any]:
         """获取统计信息"""
+        n = min(self._recent_count, self.STATS_WINDOW)
         return {
             'total_solved': self.total_solved,
             'total_failed': self.total_failed,
             'success_rate': self.success_rate,
+            'recent_count': n,
+            'recent_success_rate': float(self._recent_success[:n].mean()) if n else 0.0,
+            'recent_avg_confidence': float(self._recent_confidence[:n].mean()) if n else 0.0,
+            'recent_avg_duration': float(self._recent_duration[:n].mean()) if n else 0.0,
+            'cached_results': len(self._result_cache),
             'available_solvers': [
                 s.__class__.__name__ for s in self.hybrid_solver.solvers
                 if getattr(s, 'available', True)
@@ -618,14 +1025,34 @@ class CaptchaMiddleware:
         config = {
             'tesseract_path': settings.get('TESSERACT_PATH'),
             '2captcha_api_key': settings.get('TWO_CAPTCHA_API_KEY'),
+            'ocr_concurrency': settings.getint('OCR_CONCURRENCY', os.cpu_count() or 4),
+            'use_gpu_preprocess': settings.getbool('CAPTCHA_GPU_PREPROCESS', False),
         }
 
         self.solver = CaptchaSolver(config)
         self.auto_solve = settings.getbool('CAPTCHA_AUTO_SOLVE', True)
 
+        # 批量识别：凑满batch_size或等待batch_window秒后一起识别，batch_size<=1时逐个识别
+        # 默认逐个识别：ddddocr的solve_batch只是逐张循环，合并只会增加等待
+        self.batch_size = settings.getint('CAPTCHA_BATCH_SIZE', 1)
+        self.batch_window = settings.getfloat('CAPTCHA_BATCH_WINDOW', 0.2)
+        self._coalescer = BatchCoalescer(
+            self._solve_batch, self._batch_failure, self.batch_window, self.batch_size
+        )
+
     @classmethod
     def from_crawler(cls, crawler):
-        return cls(crawler.settings)
+        from scrapy import signals
+
+        middleware = cls(crawler.settings)
+        crawler.signals.connect(
+            middleware.spider_closed, signal=signals.spider_closed
+        )
+        return middleware
+
+    async def spider_closed(self, spider):
+        """爬虫关闭时释放HTTP会话"""
+        await self.solver.aclose()
 
     async def process_response(self, request, response, spider):
         """处理响应中的验证码"""
@@ -637,10 +1064,7 @@ class CaptchaMiddleware:
                 captcha_img = self._extract_captcha_image(response)
 
                 if captcha_img is not None:
-                    result = await self.solver.solve(
-                        captcha_img,
-                        CaptchaType.TEXT_IMAGE
-                    )
+                    result = await self._solve(captcha_img)
 
                     if result.success:
                         logger.info(f"验证码识别成功: {result.result}")
@@ -651,6 +1075,21 @@ class CaptchaMiddleware:
 
         return response
 
+    async def _solve(self, image: np.ndarray) -> CaptchaResult:
+        """识别验证码，开启批量时加入待识别队列"""
+        if self.batch_size <= 1:
+            return await self.solver.solve(image, CaptchaType.TEXT_IMAGE)
+        return await self._coalescer.submit(image)
+
+    async def _solve_batch(self, images: List[np.ndarray]) -> List[CaptchaResult]:
+        """批量识别"""
+        return await self.solver.solve_batch(images, CaptchaType.TEXT_IMAGE)
+
+    @staticmethod
+    def _batch_failure(error: Exception) -> CaptchaResult:
+        """批量识别失败结果"""
+        return CaptchaResult(success=False, result=None, confidence=0.0, solver="main", error=str(error))
+
     def _detect_captcha(self, response) -> bool:
         """检测是否包含验证码"""
         # URL检查
@@ -692,28 +1131,3 @@ async def solve_captcha(
     else:
         logger.error(f"识别失败: {result.error}")
         return None
-
-
-# 导入aiohttp（用于2Captcha）
-try:
-    import aiohttp
-except ImportError:
-    logger.warning("aiohttp未安装，2Captcha功能不可用")
-    # 创建一个模拟的aiohttp模块
-    class MockAiohttp:
-        class ClientSession:
-            async def __aenter__(self):
-                return self
-            async def __aexit__(self, *args):
-                pass
-            async def post(self, *args, **kwargs):
-                class MockResponse:
-                    async def json(self):
-                        return {'status': 0}
-                return MockResponse()
-            async def get(self, *args, **kwargs):
-                class MockResponse:
-                    async def json(self):
-                        return {'status': 0, 'request': 'ERROR'}
-                return MockResponse()
-    aiohttp = MockAiohttp()
@@ -3,9 +3,10 @@
 实现Canvas、WebGL等浏览器指纹随机化，防止被检测
 """
 import random
-import string
+import secrets
 import json
-from typing import Dict, Any, List, Optional
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 from loguru import logger
@@ -29,7 +30,49 @@ class OSType(Enum):
     IOS = "ios"
 
 
-@dataclass
+_BROWSER_TYPES = tuple(BrowserType)
+_DESKTOP_OS_TYPES = (OSType.WINDOWS, OSType.MACOS, OSType.LINUX)
+
+# 常用字体/插件（只读元组，所有配置共用同一份）
+_WINDOWS_FONTS = (
+    'Arial', 'Arial Black', 'Arial Narrow', 'Calibri', 'Cambria',
+    'Cambria Math', 'Comic Sans MS', 'Consolas', 'Courier', 'Courier New',
+    'Georgia', 'Helvetica', 'Impact', 'Lucida Console', 'Microsoft Sans Serif',
+    'Palatino Linotype', 'Segoe UI', 'Tahoma', 'Times', 'Times New Roman',
+    'Trebuchet MS', 'Verdana', 'Monaco',
+)
+
+_MAC_FONTS = (
+    'Arial', 'Arial Black', 'Arial Narrow', 'Courier', 'Courier New',
+    'Georgia', 'Helvetica', 'Helvetica Neue', 'Monaco', 'Times',
+    'Times New Roman', 'Verdana', 'SF Pro Display', 'SF Pro Text',
+    'Menlo', 'Menlo-Regular',
+)
+
+_LINUX_FONTS = (
+    'Arial', 'Courier', 'Courier New', 'DejaVu Sans', 'DejaVu Serif',
+    'FreeMono', 'FreeSans', 'FreeSerif', 'Liberation Mono',
+    'Liberation Sans', 'Liberation Serif', 'Times', 'Ubuntu',
+)
+
+# 未列出的系统使用Linux字体
+_FONTS_BY_OS: Dict[OSType, Tuple[str, ...]] = {
+    OSType.WINDOWS: _WINDOWS_FONTS,
+    OSType.MACOS: _MAC_FONTS,
+}
+
+# 内置字体列表序列化后的JSON，生成字体脚本时直接取用
+_FONTS_JSON: Dict[Tuple[str, ...], str] = {
+    fonts: json.dumps(fonts) for fonts in (_WINDOWS_FONTS, _MAC_FONTS, _LINUX_FONTS)
+}
+
+_PLUGINS_BY_BROWSER: Dict[BrowserType, Tuple[str, ...]] = {
+    BrowserType.CHROME: ('Chrome PDF Plugin', 'Chrome PDF Viewer', 'Native Client'),
+    BrowserType.FIREFOX: ('Firefox PDF Plugin',),
+}
+
+
+@dataclass(slots=True, frozen=True)
 class BrowserProfile:
     """浏览器配置文件"""
     browser_type: BrowserType
@@ -44,13 +87,22 @@ class BrowserProfile:
     webgl_renderer: str
     canvas_fingerprint: str
     audio_fingerprint: str
-    fonts: List[str] = field(default_factory=list)
-    plugins: List[str] = field(default_factory=list)
+    fonts: Tuple[str, ...] = ()
+    plugins: Tuple[str, ...] = ()
     hardware_concurrency: int = 4  # CPU核心数
     device_memory: int = 8  # 设备内存(GB)
     do_not_track: Optional[str] = None
     color_depth: int = 24
     pixel_depth: int = 24
+    # 由viewport_size解析得到，创建时计算一次
+    viewport_width: int = field(init=False, repr=False)
+    viewport_height: int = field(init=False, repr=False)
+
+    def __post_init__(self):
+        width, height = self.viewport_size.split('x')
+        # frozen数据类只能在这里通过object.__setattr__赋值
+        object.__setattr__(self, 'viewport_width', int(width))
+        object.__setattr__(self, 'viewport_height', int(height))
 
 
 class FingerprintGenerator:
@@ -134,10 +186,17 @@ class FingerprintGenerator:
         const context = this.getContext('2d');
         if (context) {
             const imageData = context.getImageData(0, 0, this.width, this.height);
-            for (let i = 0; i < imageData.data.length; i += 4) {
-                imageData.data[i] = imageData.data[i] + Math.floor(Math.random() * 3) - 1;
-                imageData.data[i + 1] = imageData.data[i + 1] + Math.floor(Math.random() * 3) - 1;
-                imageData.data[i + 2] = imageData.data[i + 2] + Math.floor(Math.random() * 3) - 1;
+            const data = imageData.data;
+            const len = data.length;
+            // 一次性批量生成随机字节（getRandomValues单次最多65536字节，分段填充）
+            const noise = new Uint8Array(len);
+            for (let offset = 0; offset < len; offset += 65536) {
+                crypto.getRandomValues(noise.subarray(offset, offset + 65536));
+            }
+            for (let i = 0; i < len; i += 4) {
+                data[i] += noise[i] % 3 - 1;
+                data[i + 1] += noise[i + 1] % 3 - 1;
+                data[i + 2] += noise[i + 2] % 3 - 1;
             }
             context.putImageData(imageData, 0, 0);
         }
@@ -145,18 +204,19 @@ class FingerprintGenerator:
     };
     """
 
+    # str.format模板：{vendor}/{renderer}为占位符，JS自身的花括号写成{{ }}
     WEBGL_NOISE_SCRIPT = """
     // WebGL指纹随机化
     const getParameter = WebGLRenderingContext.prototype.getParameter;
-    WebGLRenderingContext.prototype.getParameter = function(parameter) {
-        if (parameter === 37445) {
-            return '%WEBGL_VENDOR%';
-        }
-        if (parameter === 37446) {
-            return '%WEBGL_RENDERER%';
-        }
+    WebGLRenderingContext.prototype.getParameter = function(parameter) {{
+        if (parameter === 37445) {{
+            return '{vendor}';
+        }}
+        if (parameter === 37446) {{
+            return '{renderer}';
+        }}
         return getParameter.apply(this, arguments);
-    };
+    }};
     """
 
     AUDIO_NOISE_SCRIPT = """
@@ -178,33 +238,35 @@ class FingerprintGenerator:
         os_type: Optional[OSType] = None
     ) -> BrowserProfile:
         """生成随机浏览器配置文件"""
+        choice = random.choice
+
         # 随机选择浏览器和OS
         if browser_type is None:
-            browser_type = random.choice(list(BrowserType))
+            browser_type = choice(_BROWSER_TYPES)
 
         if os_type is None:
             # 根据浏览器选择合适的OS
             if browser_type == BrowserType.SAFARI:
                 os_type = OSType.MACOS
             else:
-                os_type = random.choice([OSType.WINDOWS, OSType.MACOS, OSType.LINUX])
+                os_type = choice(_DESKTOP_OS_TYPES)
 
-        # 获取对应配置
-        browser_configs = cls.PROFILES.get(browser_type, {})
-        os_configs = browser_configs.get(os_type, {})
+        # 获取对应配置（缺省值已在_FLAT_PROFILES中填好）
+        user_agents, resolutions, languages, timezones, webgl_vendor, webgl_renderer = \
+            _FLAT_PROFILES[(browser_type, os_type)]
 
         # 随机选择User-Agent
-        user_agent = random.choice(os_configs.get('user_agents', [cls._get_default_ua()]))
+        user_agent = choice(user_agents)
 
         # 随机选择分辨率
-        resolution = random.choice(os_configs.get('resolutions', ['1920x1080']))
+        resolution = choice(resolutions)
         viewport = resolution
 
         # 随机选择语言
-        language = random.choice(os_configs.get('languages', ['en-US']))
+        language = choice(languages)
 
         # 随机选择时区
-        timezone = random.choice(os_configs.get('timezones', ['America/New_York']))
+        timezone = choice(timezones)
 
         # 生成Canvas指纹
         canvas_fp = cls._generate_canvas_fingerprint()
@@ -213,9 +275,9 @@ class FingerprintGenerator:
         audio_fp = cls._generate_audio_fingerprint()
 
         # 设置硬件信息
-        hardware_concurrency = random.choice([2, 4, 6, 8, 12, 16])
-        device_memory = random.choice([4, 8, 16, 32])
-        device_pixel_ratio = random.choice([1.0, 2.0]) if os_type != OSType.WINDOWS else 1.0
+        hardware_concurrency = choice((2, 4, 6, 8, 12, 16))
+        device_memory = choice((4, 8, 16, 32))
+        device_pixel_ratio = choice((1.0, 2.0)) if os_type != OSType.WINDOWS else 1.0
 
         # 常用字体
         fonts = cls._get_common_fonts(os_type)
@@ -232,15 +294,15 @@ class FingerprintGenerator:
             device_pixel_ratio=device_pixel_ratio,
             language=language,
             timezone=timezone,
-            webgl_vendor=os_configs.get('webgl_vendor', 'Google Inc.'),
-            webgl_renderer=os_configs.get('webgl_renderer', 'ANGLE'),
+            webgl_vendor=webgl_vendor,
+            webgl_renderer=webgl_renderer,
             canvas_fingerprint=canvas_fp,
             audio_fingerprint=audio_fp,
             fonts=fonts,
             plugins=plugins,
             hardware_concurrency=hardware_concurrency,
             device_memory=device_memory,
-            do_not_track=random.choice([None, '1', '0']),
+            do_not_track=choice((None, '1', '0')),
             color_depth=24,
             pixel_depth=24,
         )
@@ -256,75 +318,82 @@ class FingerprintGenerator:
     def _generate_canvas_fingerprint() -> str:
         """生成Canvas指纹"""
         # 生成一个随机但稳定的Canvas指纹
-        random_part = ''.join(random.choices(string.hexdigits.lower(), k=16))
-        return f"canvas:{random_part}"
+        return f"canvas:{secrets.token_hex(8)}"
 
     @staticmethod
     def _generate_audio_fingerprint() -> str:
         """生成音频指纹"""
-        random_part = ''.join(random.choices(string.hexdigits.lower(), k=16))
-        return f"audio:{random_part}"
+        return f"audio:{secrets.token_hex(8)}"
 
     @staticmethod
-    def _get_common_fonts(os_type: OSType) -> List[str]:
+    def _get_common_fonts(os_type: OSType) -> Tuple[str, ...]:
         """获取常用字体列表"""
-        windows_fonts = [
-            'Arial', 'Arial Black', 'Arial Narrow', 'Calibri', 'Cambria',
-            'Cambria Math', 'Comic Sans MS', 'Consolas', 'Courier', 'Courier New',
-            'Georgia', 'Helvetica', 'Impact', 'Lucida Console', 'Microsoft Sans Serif',
-            'Palatino Linotype', 'Segoe UI', 'Tahoma', 'Times', 'Times New Roman',
-            'Trebuchet MS', 'Verdana', 'Monaco',
-        ]
-
-        mac_fonts = [
-            'Arial', 'Arial Black', 'Arial Narrow', 'Courier', 'Courier New',
-            'Georgia', 'Helvetica', 'Helvetica Neue', 'Monaco', 'Times',
-            'Times New Roman', 'Verdana', 'SF Pro Display', 'SF Pro Text',
-            'Menlo', 'Menlo-Regular',
-        ]
-
-        linux_fonts = [
-            'Arial', 'Courier', 'Courier New', 'DejaVu Sans', 'DejaVu Serif',
-            'FreeMono', 'FreeSans', 'FreeSerif', 'Liberation Mono',
-            'Liberation Sans', 'Liberation Serif', 'Times', 'Ubuntu',
-        ]
-
-        if os_type == OSType.WINDOWS:
-            return windows_fonts
-        elif os_type == OSType.MACOS:
-            return mac_fonts
-        else:
-            return linux_fonts
+        return _FONTS_BY_OS.get(os_type, _LINUX_FONTS)
 
     @staticmethod
-    def _get_common_plugins(browser_type: BrowserType) -> List[str]:
+    def _get_common_plugins(browser_type: BrowserType) -> Tuple[str, ...]:
         """获取常用插件"""
-        if browser_type == BrowserType.CHROME:
-            return [
-                'Chrome PDF Plugin',
-                'Chrome PDF Viewer',
-                'Native Client',
-            ]
-        elif browser_type == BrowserType.FIREFOX:
-            return [
-                'Firefox PDF Plugin',
-            ]
-        else:
-            return []
+        return _PLUGINS_BY_BROWSER.get(browser_type, ())
 
     @classmethod
     def get_stealth_scripts(cls, profile: BrowserProfile) -> List[str]:
         """获取反检测脚本"""
+        return list(cls._build_stealth_scripts(*cls._stealth_key(profile)))
+
+    @classmethod
+    def get_stealth_scripts_joined(cls, profile: BrowserProfile) -> str:
+        """获取合并成一段的反检测脚本（一次注入）"""
+        return cls._build_stealth_scripts_joined(*cls._stealth_key(profile))
+
+    @staticmethod
+    def _stealth_key(profile: BrowserProfile) -> Tuple:
+        """反检测脚本依赖的配置字段"""
+        return (
+            profile.user_agent,
+            profile.language,
+            profile.os_type.value,
+            profile.hardware_concurrency,
+            profile.device_memory,
+            profile.do_not_track,
+            profile.screen_resolution,
+            profile.color_depth,
+            profile.pixel_depth,
+            profile.webgl_vendor,
+            profile.webgl_renderer,
+            tuple(profile.fonts),
+        )
+
+    @classmethod
+    @lru_cache(maxsize=128)
+    def _build_stealth_scripts_joined(cls, *key) -> str:
+        """合并后的反检测脚本（按配置字段缓存）"""
+        return '\n'.join(cls._build_stealth_scripts(*key))
+
+    @classmethod
+    @lru_cache(maxsize=128)
+    def _build_stealth_scripts(
+        cls,
+        user_agent: str,
+        language: str,
+        platform: str,
+        hardware_concurrency: int,
+        device_memory: int,
+        do_not_track: Optional[str],
+        screen_resolution: str,
+        color_depth: int,
+        pixel_depth: int,
+        webgl_vendor: str,
+        webgl_renderer: str,
+        fonts: Tuple[str, ...]
+    ) -> Tuple[str, ...]:
+        """生成反检测脚本（只取决于传入的配置字段，同一配置重复调用直接命中缓存）"""
         scripts = []
 
-        # Canvas噪声脚本
-        canvas_script = cls.CANVAS_NOISE_SCRIPT.replace('%CANVAS_FP%', profile.canvas_fingerprint)
-        scripts.append(canvas_script)
+        # Canvas噪声脚本（不含需要替换的字段）
+        scripts.append(cls.CANVAS_NOISE_SCRIPT)
 
         # WebGL噪声脚本
-        webgl_script = cls.WEBGL_NOISE_SCRIPT.replace('%WEBGL_VENDOR%', profile.webgl_vendor)
-        webgl_script = webgl_script.replace('%WEBGL_RENDERER%', profile.webgl_renderer)
-        scripts.append(webgl_script)
+        scripts.append(cls.WEBGL_NOISE_SCRIPT.format(vendor=webgl_vendor, renderer=webgl_renderer))
 
         # 音频噪声脚本
         scripts.append(cls.AUDIO_NOISE_SCRIPT)
@@ -333,25 +402,25 @@ class FingerprintGenerator:
         navigator_script = f"""
         // 修改Navigator对象
         Object.defineProperty(navigator, 'userAgent', {{
-            get: () => '{profile.user_agent}'
+            get: () => '{user_agent}'
         }});
         Object.defineProperty(navigator, 'language', {{
-            get: () => '{profile.language}'
+            get: () => '{language}'
         }});
         Object.defineProperty(navigator, 'languages', {{
-            get: () => ['{profile.language}', 'en']
+            get: () => ['{language}', 'en']
         }});
         Object.defineProperty(navigator, 'platform', {{
-            get: () => '{profile.os_type.value}'
+            get: () => '{platform}'
         }});
         Object.defineProperty(navigator, 'hardwareConcurrency', {{
-            get: () => {profile.hardware_concurrency}
+            get: () => {hardware_concurrency}
         }});
         Object.defineProperty(navigator, 'deviceMemory', {{
-            get: () => {profile.device_memory}
+            get: () => {device_memory}
         }});
         Object.defineProperty(navigator, 'doNotTrack', {{
-            get: () => {json.dumps(profile.do_not_track)}
+            get: () => {json.dumps(do_not_track)}
         }});
         """
         scripts.append(navigator_script)
@@ -359,13 +428,13 @@ class FingerprintGenerator:
         # 修改Screen对象
         screen_script = f"""
         // 修改Screen对象
-        const [width, height] = '{profile.screen_resolution}'.split('x');
+        const [width, height] = '{screen_resolution}'.split('x');
         Object.defineProperty(screen, 'width', {{ get: () => parseInt(width) }});
         Object.defineProperty(screen, 'height', {{ get: () => parseInt(height) }});
         Object.defineProperty(screen, 'availWidth', {{ get: () => parseInt(width) }});
         Object.defineProperty(screen, 'availHeight', {{ get: () => parseInt(height) - 40 }});
-        Object.defineProperty(screen, 'colorDepth', {{ get: () => {profile.color_depth} }});
-        Object.defineProperty(screen, 'pixelDepth', {{ get: () => {profile.pixel_depth} }});
+        Object.defineProperty(screen, 'colorDepth', {{ get: () => {color_depth} }});
+        Object.defineProperty(screen, 'pixelDepth', {{ get: () => {pixel_depth} }});
         """
         scripts.append(screen_script)
 
@@ -383,11 +452,11 @@ class FingerprintGenerator:
         # 修改字体检测
         fonts_script = f"""
         // 字体检测保护
-        const fontData = {json.dumps(profile.fonts)};
+        const fontData = {_FONTS_JSON.get(fonts) or json.dumps(fonts)};
         """
         scripts.append(fonts_script)
 
-        return scripts
+        return tuple(scripts)
 
     @classmethod
     def get_playwright_args(cls, profile: BrowserProfile) -> Dict[str, Any]:
@@ -395,8 +464,8 @@ class FingerprintGenerator:
         return {
             'user_agent': profile.user_agent,
             'viewport': {
-                'width': int(profile.viewport_size.split('x')[0]),
-                'height': int(profile.viewport_size.split('x')[1]),
+                'width': profile.viewport_width,
+                'height': profile.viewport_height,
             },
             'locale': profile.language,
             'timezone_id': profile.timezone,
@@ -404,18 +473,71 @@ class FingerprintGenerator:
         }
 
 
+def _build_flat_profiles() -> Dict[Tuple[BrowserType, OSType], Tuple]:
+    """
+    把PROFILES展开成 (浏览器, 系统) -> (UA, 分辨率, 语言, 时区, WebGL厂商, WebGL渲染器)
+    所有组合都预先填好缺省值，生成配置时只需一次查表
+    """
+    flat = {}
+    for browser_type in BrowserType:
+        browser_configs = FingerprintGenerator.PROFILES.get(browser_type, {})
+        for os_type in OSType:
+            os_configs = browser_configs.get(os_type, {})
+            flat[(browser_type, os_type)] = (
+                tuple(os_configs.get('user_agents', [FingerprintGenerator._get_default_ua()])),
+                tuple(os_configs.get('resolutions', ['1920x1080'])),
+                tuple(os_configs.get('languages', ['en-US'])),
+                tuple(os_configs.get('timezones', ['America/New_York'])),
+                os_configs.get('webgl_vendor', 'Google Inc.'),
+                os_configs.get('webgl_renderer', 'ANGLE'),
+            )
+    return flat
+
+
+_FLAT_PROFILES = _build_flat_profiles()
+
+
+@lru_cache(maxsize=128)
+def _build_headers(user_agent: str, language: str) -> Dict[str, str]:
+    """生成HTTP请求头（按User-Agent和语言缓存）"""
+    return {
+        'User-Agent': user_agent,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+        'Accept-Language': f'{language},en;q=0.9',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+        'Cache-Control': 'max-age=0',
+    }
+
+
 class AntiDetectionManager:
     """反检测管理器"""
 
+    # 缓存的配置数上限，写满后按环形缓冲覆盖最旧的配置
+    MAX_CACHED_PROFILES = 256
+
     def __init__(self):
         self.current_profile: Optional[BrowserProfile] = None
+        # 用list而不是deque：random.choice需要O(1)下标访问
         self.profiles_cache: List[BrowserProfile] = []
+        self._next_slot = 0
 
     def generate_new_profile(self) -> BrowserProfile:
         """生成新的浏览器配置"""
         profile = FingerprintGenerator.generate_profile()
         self.current_profile = profile
-        self.profiles_cache.append(profile)
+
+        if len(self.profiles_cache) < self.MAX_CACHED_PROFILES:
+            self.profiles_cache.append(profile)
+        else:
+            self.profiles_cache[self._next_slot] = profile
+            self._next_slot = (self._next_slot + 1) % self.MAX_CACHED_PROFILES
         return profile
 
     def get_random_profile(self) -> BrowserProfile:
@@ -429,16 +551,21 @@ class AntiDetectionManager:
         """获取当前配置"""
         return self.current_profile
 
-    async def apply_to_playwright(self, page, profile: BrowserProfile):
-        """将反检测措施应用到Playwright页面"""
-        # 设置视口
-        width, height = map(int, profile.viewport_size.split('x'))
-        await page.set_viewport_size(viewport_size={'width': width, 'height': height})
+    async def apply_to_playwright(self, page, profile: BrowserProfile, set_viewport: bool = False):
+        """
+        将反检测措施应用到Playwright页面
+
+        视口应在创建上下文时通过 browser.new_context(**get_playwright_args(profile)) 设置，
+        这里默认不再调用set_viewport_size（多一次与浏览器的往返）；
+        页面所在上下文不是这样创建的，传 set_viewport=True
+        """
+        if set_viewport:
+            await page.set_viewport_size(
+                viewport_size={'width': profile.viewport_width, 'height': profile.viewport_height}
+            )
 
-        # 注入反检测脚本
-        scripts = FingerprintGenerator.get_stealth_scripts(profile)
-        for script in scripts:
-            await page.add_init_script(script)
+        # 注入反检测脚本（合并为一段，一次调用完成）
+        await page.add_init_script(FingerprintGenerator.get_stealth_scripts_joined(profile))
 
         logger.info(f"已应用反检测配置: {profile.browser_type.value} on {profile.os_type.value}")
 
@@ -448,8 +575,7 @@ class AntiDetectionManager:
         # 注意：需要在启动浏览器时通过ChromeOptions设置
 
         # 执行JavaScript修改navigator等对象
-        scripts = FingerprintGenerator.get_stealth_scripts(profile)
-        combined_script = '\n'.join(scripts)
+        combined_script = FingerprintGenerator.get_stealth_scripts_joined(profile)
 
         driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
             'source': combined_script
@@ -462,20 +588,8 @@ class AntiDetectionManager:
         if profile is None:
             profile = self.get_current_profile() or self.generate_new_profile()
 
-        return {
-            'User-Agent': profile.user_agent,
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': f'{profile.language},en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'Cache-Control': 'max-age=0',
-        }
+        # 返回副本，调用方修改不影响缓存
+        return dict(_build_headers(profile.user_agent, profile.language))
 
 
 # 全局管理器实例
@@ -498,6 +612,10 @@ class FingerprintMiddleware:
         self.manager = get_anti_detection_manager()
         self.manager.generate_new_profile()
 
+        # 当前配置对应的请求头，预编码为 (bytes, bytes)，配置切换时才重新生成
+        self._headers_profile: Optional[BrowserProfile] = None
+        self._encoded_headers: Tuple[Tuple[bytes, bytes], ...] = ()
+
     @classmethod
     def from_crawler(cls, crawler):
         return cls(crawler.settings)
@@ -507,10 +625,17 @@ class FingerprintMiddleware:
         profile = self.manager.get_current_profile()
 
         if profile:
-            headers = self.manager.get_headers(profile)
-            for key, value in headers.items():
-                if key not in request.headers:
-                    request.headers[key] = value
+            if profile is not self._headers_profile:
+                self._headers_profile = profile
+                self._encoded_headers = tuple(
+                    (key.encode(), value.encode())
+                    for key, value in _build_headers(profile.user_agent, profile.language).items()
+                )
+
+            headers = request.headers
+            for key, value in self._encoded_headers:
+                if key not in headers:
+                    headers[key] = value
 
         return None
 
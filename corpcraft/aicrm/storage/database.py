@@ -3,17 +3,22 @@
 封装所有数据库操作
 """
 from typing import List, Optional, Dict, Any
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 from datetime import datetime, timedelta
 from loguru import logger
 
-from sqlalchemy import create_engine, and_, or_
+import xxhash
+from sqlalchemy import create_engine, and_, or_, func, select
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.sql import Select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
 from pymongo import MongoClient
 from motor.motor_asyncio import AsyncIOMotorClient
 from elasticsearch import AsyncElasticsearch
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 
 from config.settings import settings
 from storage.models import (
@@ -31,12 +36,19 @@ class DatabaseManager:
         self.pg_engine = create_engine(settings.postgres_url, pool_pre_ping=True)
         self.SessionLocal = sessionmaker(bind=self.pg_engine)
 
+        # PostgreSQL（异步，供API使用，避免阻塞事件循环）
+        self.pg_async_engine = create_async_engine(settings.postgres_async_url, pool_pre_ping=True)
+        self.AsyncSessionLocal = async_sessionmaker(bind=self.pg_async_engine, expire_on_commit=False)
+
         # MongoDB
         self.mongo_client: Optional[AsyncIOMotorClient] = None
 
         # Elasticsearch
         self.es_client: Optional[AsyncElasticsearch] = None
 
+        # Redis
+        self.redis_client: Optional[Redis] = None
+
     def init_db(self):
         """初始化数据库"""
         from storage.models import Base
@@ -53,6 +65,11 @@ class DatabaseManager:
         self.es_client = AsyncElasticsearch(settings.elasticsearch_url)
         logger.info("Elasticsearch初始化完成")
 
+    async def init_redis(self):
+        """初始化Redis"""
+        self.redis_client = Redis.from_url(settings.redis_url)
+        logger.info("Redis初始化完成")
+
     @contextmanager
     def get_session(self):
         """获取数据库会话"""
@@ -67,11 +84,23 @@ class DatabaseManager:
         finally:
             session.close()
 
+    @asynccontextmanager
+    async def get_async_session(self):
+        """获取异步数据库会话"""
+        async with self.AsyncSessionLocal() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"数据库操作失败: {e}")
+                raise
+
     # 企业相关操作
     def create_company(self, company_data: CompanyCreate) -> Company:
         """创建企业"""
         with self.get_session() as session:
-            db_company = Company(**company_data.dict())
+            db_company = Company(**company_data.model_dump())
             session.add(db_company)
             session.commit()
             session.refresh(db_company)
@@ -95,7 +124,7 @@ class DatabaseManager:
         with self.get_session() as session:
             db_company = session.query(Company).filter(Company.id == company_id).first()
             if db_company:
-                for key, value in company_data.dict(exclude_unset=True).items():
+                for key, value in company_data.model_dump(exclude_unset=True).items():
                     setattr(db_company, key, value)
                 db_company.updated_at = datetime.now()
                 session.commit()
@@ -126,32 +155,16 @@ class DatabaseManager:
     ) -> List[Company]:
         """搜索企业"""
         with self.get_session() as session:
-            query = session.query(Company)
-
-            # 关键词搜索
-            if keyword:
-                query = query.filter(
-                    or_(
-                        Company.name.ilike(f"%{keyword}%"),
-                        Company.business_scope.ilike(f"%{keyword}%"),
-                    )
-                )
-
-            # 行业筛选
-            if industry:
-                query = query.filter(Company.industry == industry)
-
-            # 地区筛选
-            if province:
-                query = query.filter(Company.province == province)
-            if city:
-                query = query.filter(Company.city == city)
-
-            # 状态筛选
-            if business_status:
-                query = query.filter(Company.business_status == business_status.value)
-
-            return query.offset(skip).limit(limit).all()
+            stmt = build_company_search(
+                keyword=keyword,
+                industry=industry,
+                province=province,
+                city=city,
+                business_status=business_status,
+                skip=skip,
+                limit=limit,
+            )
+            return session.execute(stmt).scalars().all()
 
     def get_companies_by_industry(self, industry: str, limit: int = 100) -> List[Company]:
         """按行业获取企业"""
@@ -172,7 +185,7 @@ class DatabaseManager:
     def create_contact(self, contact_data: ContactCreate) -> Contact:
         """创建联系人"""
         with self.get_session() as session:
-            db_contact = Contact(**contact_data.dict())
+            db_contact = Contact(**contact_data.model_dump())
             session.add(db_contact)
             session.commit()
             session.refresh(db_contact)
@@ -220,10 +233,52 @@ class DatabaseManager:
     def get_recent_companies(self, days: int = 7, limit: int = 100) -> List[Company]:
         """获取最近添加的企业"""
         with self.get_session() as session:
-            start_date = datetime.now() - timedelta(days=days)
-            return session.query(Company).filter(
-                Company.crawled_at >= start_date
-            ).order_by(Company.crawled_at.desc()).limit(limit).all()
+            return session.execute(build_recent_companies(days=days, limit=limit)).scalars().all()
+
+    async def get_intent_score_version(self, session: AsyncSession, company_id: int) -> Optional[int]:
+        """
+        获取企业意向评分的数据版本
+
+        由企业更新时间、互动记录最近更新时间和互动数量计算，
+        企业或互动记录的新增、修改、删除都会使版本变化；企业不存在时返回None。
+        """
+        result = await session.execute(
+            select(Company.updated_at, func.max(Interaction.updated_at), func.count(Interaction.id))
+            .outerjoin(Interaction, Interaction.company_id == Company.id)
+            .where(Company.id == company_id)
+            .group_by(Company.id)
+        )
+        row = result.first()
+
+        if row is None:
+            return None
+
+        updated_at, interactions_updated_at, interaction_count = row
+        return xxhash.xxh64_intdigest(f"{updated_at}|{interactions_updated_at}|{interaction_count}".encode())
+
+    # Redis缓存操作
+    async def get_cached_intent_score(self, company_id: int, version: int) -> Optional[bytes]:
+        """获取缓存的意向评分（JSON），未命中或Redis不可用时返回None"""
+        if not self.redis_client:
+            await self.init_redis()
+
+        try:
+            return await self.redis_client.get(f"intent:{company_id}:{version}")
+        except RedisError as e:
+            logger.warning(f"读取意向评分缓存失败: {e}")
+            return None
+
+    async def cache_intent_score(self, company_id: int, version: int, payload: bytes):
+        """缓存意向评分（JSON）"""
+        if not self.redis_client:
+            await self.init_redis()
+
+        try:
+            await self.redis_client.setex(
+                f"intent:{company_id}:{version}", settings.INTENT_SCORE_CACHE_TTL, payload
+            )
+        except RedisError as e:
+            logger.warning(f"写入意向评分缓存失败: {e}")
 
     # MongoDB操作
     async def save_raw_data(self, collection: str, data: Dict[str, Any]) -> str:
@@ -306,9 +361,59 @@ class DatabaseManager:
             self.mongo_client.close()
         if self.es_client:
             await self.es_client.close()
+        if self.redis_client:
+            await self.redis_client.aclose()
+        await self.pg_async_engine.dispose()
         logger.info("数据库连接已关闭")
 
 
+# 查询构建（同步与异步会话共用）
+def build_company_search(
+    keyword: Optional[str] = None,
+    industry: Optional[str] = None,
+    province: Optional[str] = None,
+    city: Optional[str] = None,
+    business_status: Optional[BusinessStatus] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> Select:
+    """构建企业搜索查询"""
+    stmt = select(Company)
+
+    # 关键词搜索
+    if keyword:
+        stmt = stmt.where(
+            or_(
+                Company.name.ilike(f"%{keyword}%"),
+                Company.business_scope.ilike(f"%{keyword}%"),
+            )
+        )
+
+    # 行业筛选
+    if industry:
+        stmt = stmt.where(Company.industry == industry)
+
+    # 地区筛选
+    if province:
+        stmt = stmt.where(Company.province == province)
+    if city:
+        stmt = stmt.where(Company.city == city)
+
+    # 状态筛选
+    if business_status:
+        stmt = stmt.where(Company.business_status == business_status.value)
+
+    return stmt.offset(skip).limit(limit)
+
+
+def build_recent_companies(days: int = 7, limit: int = 100) -> Select:
+    """构建最近添加企业查询"""
+    start_date = datetime.now() - timedelta(days=days)
+    return select(Company).where(
+        Company.crawled_at >= start_date
+    ).order_by(Company.crawled_at.desc()).limit(limit)
+
+
 # 单例模式
 _db_manager: Optional[DatabaseManager] = None
 
@@ -333,6 +438,12 @@ async def init_async_databases():
     db = get_db_manager()
     await db.init_mongodb()
     await db.init_elasticsearch()
+    await db.init_redis()
+
+
+def get_async_session():
+    """获取异步数据库会话（async with使用）"""
+    return get_db_manager().get_async_session()
 
 
 # 依赖注入（用于FastAPI）
@@ -343,10 +454,25 @@ def get_db():
         yield session
 
 
+async def get_async_db():
+    """
+    FastAPI依赖注入 - 获取异步数据库会话
+
+    写操作由接口自行commit，请求结束时关闭会话（未提交的修改回滚）。
+    """
+    db = get_db_manager()
+    async with db.AsyncSessionLocal() as session:
+        yield session
+
+
 __all__ = [
     'DatabaseManager',
     'get_db_manager',
     'init_database',
     'init_async_databases',
+    'get_async_session',
+    'get_async_db',
+    'build_company_search',
+    'build_recent_companies',
     'get_db',
 ]
@@ -7,7 +7,7 @@ from typing import Optional, List
 from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from enum import Enum
 
 
@@ -73,6 +73,7 @@ class Company(Base):
     # 关系
     contacts = relationship("Contact", back_populates="company", cascade="all, delete-orphan")
     financial_records = relationship("FinancialRecord", back_populates="company", cascade="all, delete-orphan")
+    interactions = relationship("Interaction", back_populates="company", cascade="all, delete-orphan")
 
 
 class Contact(Base):
@@ -140,8 +141,10 @@ class Interaction(Base):
     # 创建人
     created_by = Column(String(100), comment="创建人")
     created_at = Column(DateTime, default=datetime.now, comment="创建时间")
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
 
     # 关系
+    company = relationship("Company", back_populates="interactions")
     contact = relationship("Contact", back_populates="interactions")
 
 
@@ -215,6 +218,8 @@ class CompanyUpdate(BaseModel):
 
 class CompanyResponse(CompanyBase):
     """企业响应模型"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     registration_address: Optional[str] = None
     phone: Optional[str] = None
@@ -223,9 +228,6 @@ class CompanyResponse(CompanyBase):
     crawled_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 class ContactBase(BaseModel):
     """联系人基础模型"""
@@ -245,15 +247,14 @@ class ContactCreate(ContactBase):
 
 class ContactResponse(ContactBase):
     """联系人响应模型"""
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     company_id: int
     mobile: Optional[str] = None
     wechat: Optional[str] = None
     crawled_at: datetime
 
-    class Config:
-        from_attributes = True
-
 
 # MongoDB模型（非结构化数据）
 class RawData: